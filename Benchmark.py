@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
+import argparse
+import json
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from Sudoku_Board import SudokuBoard, Variable
-from Solver import BTSolver
+from Sudoku_Board import SudokuBoard, BoardCorpus
+from Solver import BTSolver, DLXSolver, SolveLimits, SolverStats
 from Sudoku_Board.Trail import Trail
 import time
 
 
-def main():
+def main(jobs, trial_time, corpus_path=None, corpus_trials=None, profile=False, profile_path=None):
     # settings dict of the solver names and
     # a tuple storing the (consistency check, variable selection heuristic and value selection heuristic)
     # an empty string specifies no heuristic (ie: returning the vars/values in random order)
+    # the "dancingLinks" consistency check selects the exact cover solver, which takes no heuristics
     solver_settings = {
         "FC": ("forwardChecking", "", ""),
         "NOR": ("norvigCheck", "", ""),
@@ -24,7 +29,8 @@ def main():
         "NOR MRV LCV": ("norvigCheck", "MinimumRemainingValue", "LeastConstrainingValue"),
         "FC MAD LCV": ("forwardChecking", "MRVwithTieBreaker", "LeastConstrainingValue"),
         "NOR MAD LCV": ("norvigCheck", "MRVwithTieBreaker", "LeastConstrainingValue"),
-        "TOURNAMENT1": ("tournCC", "tournVar", "tournVal")
+        "TOURNAMENT1": ("tournCC", "tournVar", "tournVal"),
+        "DLX": ("dancingLinks", "", ""),
 
     }
 
@@ -51,12 +57,52 @@ def main():
     # names of the solvers in the solver_settings dict to compare during each trial
     solvers_to_benchmark = ["NOR MAD LCV", "TOURNAMENT1"]
 
-    for trial_name, difficulty_config, num_trials in trial_settings:
+    # with a corpus, its boards replace the generated ones: every board in order, or corpus_trials drawn at random
+    corpus = BoardCorpus.BoardCorpus(corpus_path) if corpus_path is not None else None
+    if corpus is not None:
+        num_corpus_trials = len(corpus) if corpus_trials is None else min(corpus_trials, len(corpus))
+        trial_settings = (
+            (f"Corpus {os.path.basename(corpus_path)} ({corpus.p}x{corpus.q})", corpus, num_corpus_trials),
+        )
+
+    # search profiles of the backtracking solvers, by trial name then solver name, when profiling
+    profiles = dict() if profile or profile_path is not None else None
+
+    # trials run in a pool of worker processes, or in this process when jobs is 1
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        run_trial_settings(trial_settings, solver_settings, solvers_to_benchmark, executor, trial_time, profiles,
+                           profile)
+        if profile_path is not None:
+            with open(profile_path, "w") as f:
+                json.dump({trial_name: {solver_name: stats.toDict() for solver_name, stats in solver_profiles.items()}
+                           for trial_name, solver_profiles in profiles.items()}, f, indent=2)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if corpus is not None:
+            corpus.close()
+
+
+def make_boards(board_source, num_trials):
+    """
+    Returns: num_trials boards, generated from a (p, q, m) difficulty config or drawn from a BoardCorpus
+    """
+    if isinstance(board_source, BoardCorpus.BoardCorpus):
+        if num_trials >= len(board_source):
+            return list(board_source)
+        return [board_source.getBoard(i) for i in sorted(random.sample(range(len(board_source)), num_trials))]
+    return [SudokuBoard.SudokuBoard(*board_source) for _ in range(num_trials)]
+
+
+def run_trial_settings(trial_settings, solver_settings, solvers_to_benchmark, executor, trial_time, profiles=None,
+                       print_profiles=False):
+    for trial_name, board_source, num_trials in trial_settings:
 
         if num_trials <= 0:
             continue
 
-        boards = [SudokuBoard.SudokuBoard(*difficulty_config) for _ in range(num_trials)]
+        boards = make_boards(board_source, num_trials)
 
         print()
         print(f"-" * 80)
@@ -68,63 +114,58 @@ def main():
 
         solver_backtrack_scores = {solver_name: 0 for solver_name in solvers_to_benchmark}
         solver_backtrack_counts = {solver_name: 0 for solver_name in solvers_to_benchmark}
-        solver_last_backtrack_count = {solver_name: 0 for solver_name in solvers_to_benchmark}
         solver_total_time_elapsed = {solver_name: 0 for solver_name in solvers_to_benchmark}
         solver_time_scores = {solver_name: 0 for solver_name in solvers_to_benchmark}
-        solver_last_time_elapsed = {solver_name: 0 for solver_name in solvers_to_benchmark}
         solver_failures = {solver_name: 0 for solver_name in solvers_to_benchmark}
+        solver_timeouts = {solver_name: 0 for solver_name in solvers_to_benchmark}
+        # merged search profile of each backtracking solver, filled only when profiles is a dict
+        solver_profiles = dict()
+        if profiles is not None:
+            profiles[trial_name] = solver_profiles
 
-        current_solver_index = 0
-        current_solver_name = solvers_to_benchmark[current_solver_index]
-        progress_bar_prefix = [current_solver_name]
-        progress_bar_suffix = ["Last backtrack winner: N/A, Last time winner: N/A"]
-
-        for i in print_progress_bar(range(num_trials * len(solvers_to_benchmark)), len(solvers_to_benchmark),
-                                    prefix=progress_bar_prefix,
-                                    suffix=progress_bar_suffix,
-                                    length=150
-                                    ):
-
-            trial_number = i // len(solvers_to_benchmark)
-            Trail.numPush = 0
-            Trail.numUndo = 0
-            trail = Trail()
-            Variable.STATIC_NAMING_COUNTER = 1
-            sudoku_board = boards[trial_number]
-
-            consistency_check, variable_heuristic, value_heuristic = solver_settings[current_solver_name]
-
-            solver = BTSolver.BTSolver(sudoku_board, trail, value_heuristic, variable_heuristic, consistency_check)
+        # (time taken, backtracks or -1 on failure) of each solver on each trial, filled in as the jobs finish
+        trial_results = [dict() for _ in range(num_trials)]
 
-            current_time = time.time()
-            solver.checkConsistency()
-            solver.solve()
-            end_time = time.time()
-            time_taken = end_time - current_time
-            solver_total_time_elapsed[current_solver_name] += time_taken
-            solver_last_time_elapsed[current_solver_name] = time_taken
-
-            if solver.hassolution:
-
-                solver_backtrack_counts[current_solver_name] += trail.getUndoCount()
-                solver_last_backtrack_count[current_solver_name] = trail.getUndoCount()
+        progress_bar_prefix = [solvers_to_benchmark[0]]
+        progress_bar_suffix = ["Last backtrack winner: N/A, Last time winner: N/A"]
 
+        jobs = [(trial_number, solver_name)
+                for trial_number in range(num_trials) for solver_name in solvers_to_benchmark]
+
+        for trial_number, solver_name, time_taken, backtracks, reason, stats in print_progress_bar(
+                run_jobs(jobs, boards, solver_settings, executor, trial_time, profiles is not None), len(jobs),
+                len(solvers_to_benchmark),
+                prefix=progress_bar_prefix,
+                suffix=progress_bar_suffix,
+                length=150
+        ):
+
+            solver_total_time_elapsed[solver_name] += time_taken
+            if stats is not None:
+                solver_profiles.setdefault(solver_name, SolverStats.SolverStats()).merge(
+                    SolverStats.SolverStats.fromDict(stats))
+
+            if backtracks != -1:
+                solver_backtrack_counts[solver_name] += backtracks
+            elif reason == SolveLimits.TIMEOUT:
+                solver_timeouts[solver_name] += 1
             else:
-                solver_last_backtrack_count[current_solver_name] = -1
-                solver_failures[current_solver_name] += 1
+                solver_failures[solver_name] += 1
 
-            current_solver_index += 1
-            if current_solver_index == len(solvers_to_benchmark):
-                current_solver_index = 0
+            results = trial_results[trial_number]
+            results[solver_name] = (time_taken, backtracks)
+
+            # every solver finished this board, score it
+            if len(results) == len(solvers_to_benchmark):
                 time_winner = min(
                     (solver_name for solver_name in solvers_to_benchmark),
-                    key=lambda x: solver_last_time_elapsed[x]
+                    key=lambda x: results[x][0]
                 )
                 solver_time_scores[time_winner] += 1
                 backtrack_winner = min(
                     (solver_name for solver_name in solvers_to_benchmark
-                     if solver_last_backtrack_count[solver_name] != -1),
-                    key=lambda x: solver_last_backtrack_count[x], default="All Failed"
+                     if results[solver_name][1] != -1),
+                    key=lambda x: results[x][1], default="All Failed"
                 )
                 if backtrack_winner != "All Failed":
                     solver_backtrack_scores[backtrack_winner] += 1
@@ -132,8 +173,7 @@ def main():
                     "Last backtrack winner: " + str(backtrack_winner) + \
                     ", Last time winner: " + str(time_winner)
 
-            current_solver_name = solvers_to_benchmark[current_solver_index]
-            progress_bar_prefix[0] = current_solver_name
+            progress_bar_prefix[0] = solver_name
 
         print('-' * 80)
 
@@ -155,16 +195,73 @@ def main():
 
         print(f"Failure stats between {', '.join(solver_name for solver_name in solvers_to_benchmark)}")
         for solver_name in solvers_to_benchmark:
-            print(f"{solver_name} failures: {solver_failures[solver_name]} failures")
+            print(f"{solver_name} failures: {solver_failures[solver_name]} failures, "
+                  f"timeouts: {solver_timeouts[solver_name]} trials over {trial_time} seconds")
 
         print('-' * 80)
 
+        if print_profiles:
+            for solver_name in solvers_to_benchmark:
+                if solver_name in solver_profiles:
+                    print(f"{solver_name} search profile over {num_trials} trials")
+                    print(solver_profiles[solver_name])
+                    print('-' * 80)
+
+
+def make_solver(sudoku_board, trail, solver_setting):
+    consistency_check, variable_heuristic, value_heuristic = solver_setting
+
+    if consistency_check == "dancingLinks":
+        return DLXSolver.DLXSolver(sudoku_board, trail)
+    return BTSolver.BTSolver(sudoku_board, trail, value_heuristic, variable_heuristic, consistency_check)
+
+
+def run_trial(sudoku_board, solver_setting, trial_time, profile=False):
+    """
+    Solves one board with one solver setting for up to trial_time seconds, timing the solve where it runs
+    (in a worker when parallel)
+    Returns: the time taken in seconds, the number of backtracks or -1 if no solution was found,
+        the SolveResult reason the solve stopped for, and the search profile as a dict when profile is set
+        and the solver is a BTSolver (None otherwise)
+    """
+    trail = Trail()
+    solver = make_solver(sudoku_board, trail, solver_setting)
+    stats = solver.enableProfiling() if profile and isinstance(solver, BTSolver.BTSolver) else None
+
+    current_time = time.time()
+    solver.checkConsistency()
+    result = solver.solveWithLimits(SolveLimits.SolveLimits(time_limit=trial_time))
+    end_time = time.time()
+
+    return (end_time - current_time, trail.getUndoCount() if solver.hassolution else -1, result.reason,
+            stats.toDict() if stats is not None else None)
+
+
+def run_jobs(jobs, boards, solver_settings, executor, trial_time, profile=False):
+    """
+    Runs the (trial number, solver name) jobs, in order in this process if executor is None
+    Yields: (trial number, solver name, time taken, backtracks or -1, stop reason, profile or None) as each job
+        finishes
+    """
+    if executor is None:
+        for trial_number, solver_name in jobs:
+            yield (trial_number, solver_name) + run_trial(boards[trial_number], solver_settings[solver_name],
+                                                          trial_time, profile)
+        return
+
+    futures = {
+        executor.submit(run_trial, boards[trial_number], solver_settings[solver_name], trial_time, profile):
+            (trial_number, solver_name)
+        for trial_number, solver_name in jobs
+    }
+    for future in as_completed(futures):
+        yield futures[future] + future.result()
+
 
-def print_progress_bar(iterable, num_solvers, prefix, suffix, length):
+def print_progress_bar(iterable, total, num_solvers, prefix, suffix, length):
     # src: https://stackoverflow.com/questions/3173320/text-progress-bar-in-terminal-with-block-characters
 
     fill = '█'
-    total = len(iterable)
 
     # Progress Bar Printing Function
     def printProgressBar(iteration):
@@ -188,4 +285,22 @@ def print_progress_bar(iterable, num_solvers, prefix, suffix, length):
     print()
 
 
-main()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sudoku solver settings against each other.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes running trials, 1 runs every trial in this process "
+                             "(default: number of CPU cores)")
+    parser.add_argument("--trial-time", type=float, default=60,
+                        help="seconds a solver may spend on one trial before it is counted as a timeout "
+                             "(default: 60)")
+    parser.add_argument("--corpus", default=None,
+                        help="binary board corpus to draw the trials from instead of generating boards "
+                             "(see Sudoku_Board/BoardCorpus.py)")
+    parser.add_argument("--corpus-trials", type=int, default=None,
+                        help="with --corpus, number of boards drawn at random from it (default: every board)")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile the searches of the backtracking solvers and print the phase times of each")
+    parser.add_argument("--profile-json", default=None,
+                        help="write the search profiles of the backtracking solvers to this JSON file")
+    args = parser.parse_args()
+    main(args.jobs, args.trial_time, args.corpus, args.corpus_trials, args.profile, args.profile_json)
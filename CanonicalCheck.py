@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import time
+
+from Sudoku_Board import SudokuBoard, BoardSymmetry
+
+"""
+    Checks that reducing a board to its canonical form (see
+    Sudoku_Board/BoardSymmetry.py) stays fast on the shapes with the most
+    ties: nearly empty boards, whose lines all tie, with wide blocks, whose
+    bands or stacks have the most orders. Each board must be canonicalized
+    within --max-seconds, and an equivalent board, its values relabeled and
+    its bands, stacks and lines shuffled, must reach the same form as long as
+    the orders tried are not capped.
+"""
+
+# (p, q) shapes checked, the widest blocks first
+SHAPES = ((3, 10), (10, 3), (3, 11), (2, 17), (5, 7), (7, 5), (6, 6), (5, 5), (4, 4), (3, 4), (3, 3))
+
+# givens of the nearly empty boards checked
+GIVENS = (0, 1, 3)
+
+
+def make_board(p, q, givens):
+    """
+    Returns: the empty p x q board with the values 1 to givens placed on its diagonal
+    """
+    n = p * q
+    grid = [[0] * n for _ in range(n)]
+    for k in range(givens):
+        grid[k][k] = k + 1
+    return SudokuBoard.SudokuBoard(p, q, board=grid)
+
+
+def shuffle_board(board, rng):
+    """
+    Returns: board with its values relabeled and its bands, stacks, rows within bands and columns within stacks
+        shuffled, an equivalent board
+    """
+    p, q, n = board.p, board.q, board.p * board.q
+    labels = list(range(1, n + 1))
+    rng.shuffle(labels)
+    labels = [0] + labels
+
+    def shuffled_lines(groups, size):
+        order = rng.sample(range(groups), groups)
+        return [group * size + line for group in order for line in rng.sample(range(size), size)]
+
+    rows = shuffled_lines(q, p)
+    cols = shuffled_lines(p, q)
+    grid = [[labels[board.board[row][col]] for col in cols] for row in rows]
+    return SudokuBoard.SudokuBoard(p, q, board=grid)
+
+
+def main(max_seconds, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for p, q in SHAPES:
+        for givens in GIVENS:
+            board = make_board(p, q, givens)
+            start = time.perf_counter()
+            line, _ = BoardSymmetry.canonicalize(board)
+            elapsed = time.perf_counter() - start
+
+            status = "ok"
+            if elapsed > max_seconds:
+                status = f"SLOW, over {max_seconds} seconds"
+            # an empty board or one given value ties few enough lines to be tried in every order
+            elif givens <= 1 and BoardSymmetry.canonicalize(shuffle_board(board, rng))[0] != line:
+                status = "MISMATCH, an equivalent board has another form"
+            if status != "ok":
+                failures += 1
+            print(f"{p}x{q} with {givens} givens: {elapsed * 1000:.1f} ms {status}")
+
+    if failures:
+        print(f"{failures} failures")
+        return 1
+    print("Every board was canonicalized in time")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that boards with many ties are canonicalized quickly.")
+    parser.add_argument("--max-seconds", type=float, default=1.0,
+                        help="seconds each board may take to be canonicalized (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the shuffled boards (default: 0)")
+    args = parser.parse_args()
+    exit(main(args.max_seconds, args.seed))
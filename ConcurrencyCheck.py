@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from Sudoku_Board import SudokuBoard, BoardLines
+from Sudoku_Board.Trail import Trail
+from Solver import BTSolver, DLXSolver, SolveLimits
+
+"""
+    Checks that solves running in threads of one process keep their own
+    statistics. Every job is solved once in this process, one at a time, then
+    again rounds times by a pool of threads all started together, and each
+    threaded run must report exactly what its sequential run reported: stop
+    reason, nodes, backtracks, trail pushes and undos, variable names,
+    solutions and, for profiled jobs, the search profile's counts.
+
+    Every setting searches deterministically and every job runs under a node
+    budget instead of a time limit, so any difference can only come from
+    state shared between the solves.
+"""
+
+# solver settings checked, as (consistency check, variable selection heuristic, value selection heuristic) like
+# in Benchmark.py
+SOLVER_SETTINGS = {
+    "TOURNAMENT1": ("tournCC", "tournVar", "tournVal"),
+    "NOR MAD LCV": ("norvigCheck", "MRVwithTieBreaker", "LeastConstrainingValue"),
+    "DLX": ("dancingLinks", "", ""),
+}
+
+# (p, q, m) configurations of the generated boards
+BOARD_CONFIGS = ((3, 3, 7), (3, 4, 11), (4, 4, 20))
+
+# nodes each solve may take, so every run of a job stops at the same point
+MAX_NODES = 2000
+
+# solutions counted by the counting jobs
+COUNT_SOLUTIONS = 3
+
+
+def make_boards(num_boards, seed):
+    """
+    Returns: the sample boards followed by num_boards generated ones of each configuration, as (name, board)
+    """
+    boards = []
+    sample_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sample_Boards")
+    if os.path.isdir(sample_dir):
+        for filename in sorted(os.listdir(sample_dir)):
+            boards.append((filename, SudokuBoard.SudokuBoard(filepath=os.path.join(sample_dir, filename))))
+
+    random.seed(seed)
+    for p, q, m in BOARD_CONFIGS:
+        for i in range(num_boards):
+            boards.append((f"{p}x{q} m={m} #{i}", SudokuBoard.SudokuBoard(p, q, m)))
+    return boards
+
+
+def make_jobs(boards):
+    """
+    Returns: every (board name, board, solver name, mode) job, mode being "solve", "profile" or "count"
+    """
+    jobs = []
+    for board_name, board in boards:
+        for solver_name, setting in SOLVER_SETTINGS.items():
+            jobs.append((board_name, board, solver_name, "solve"))
+            jobs.append((board_name, board, solver_name, "count"))
+            if setting[0] != "dancingLinks":
+                jobs.append((board_name, board, solver_name, "profile"))
+    return jobs
+
+
+def run_job(job):
+    """
+    Solves one job on its own trail and solver
+    Returns: everything the solve reported that does not depend on timing
+    """
+    board_name, board, solver_name, mode = job
+    consistency_check, variable_heuristic, value_heuristic = SOLVER_SETTINGS[solver_name]
+
+    # each run gets its own copy of the givens, as a service handling a request would
+    board = SudokuBoard.SudokuBoard(board.p, board.q, board=[list(row) for row in board.board])
+    trail = Trail()
+    if consistency_check == "dancingLinks":
+        solver = DLXSolver.DLXSolver(board, trail)
+    else:
+        solver = BTSolver.BTSolver(board, trail, value_heuristic, variable_heuristic, consistency_check)
+    stats = solver.enableProfiling() if mode == "profile" else None
+
+    limits = SolveLimits.SolveLimits(max_nodes=MAX_NODES)
+    solver.checkConsistency()
+    if mode == "count":
+        count, solutions, result = solver.countSolutions(COUNT_SOLUTIONS, limits)
+    else:
+        result = solver.solveWithLimits(limits)
+        solutions = [solver.getSolution()] if solver.hassolution else []
+        count = len(solutions)
+
+    report = {
+        "reason": result.reason,
+        "nodes": result.nodes,
+        "backtracks": result.backtracks,
+        "pushes": result.pushes,
+        "trailPushes": trail.getPushCount(),
+        "trailUndos": trail.getUndoCount(),
+        "count": count,
+        "solutions": [BoardLines.formatLine(solution) for solution in solutions],
+    }
+    if isinstance(solver, BTSolver.BTSolver):
+        report["names"] = [v.getName() for v in solver.network.getVariables()]
+    if stats is not None:
+        profile = stats.toDict()
+        for name in ("calls", "removals", "assignments", "maxDepth", "nodes", "backtracks", "pushes", "searches"):
+            report["profile " + name] = profile[name]
+    return report
+
+
+def compare(job, expected, actual):
+    """
+    Returns: a line describing each field of actual that differs from expected
+    """
+    board_name, _, solver_name, mode = job
+    return [f"{solver_name} {mode} on {board_name}: {name} {actual.get(name)!r} != {value!r}"
+            for name, value in expected.items() if actual.get(name) != value]
+
+
+def main(num_boards, threads, rounds, seed):
+    jobs = make_jobs(make_boards(num_boards, seed))
+    print(f"Solving {len(jobs)} jobs one at a time")
+    expected = [run_job(job) for job in jobs]
+
+    # switch threads every few bytecodes so the solves interleave inside their searches
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        failures = []
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for round_number in range(rounds):
+                print(f"Round {round_number + 1}/{rounds}: solving {len(jobs)} jobs on {threads} threads")
+                for job, want, got in zip(jobs, expected, executor.map(run_job, jobs)):
+                    failures.extend(compare(job, want, got))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    if failures:
+        for line in failures:
+            print("[MISMATCH] " + line)
+        print(f"{len(failures)} mismatches")
+        return 1
+    print(f"Every threaded run matched its sequential run ({len(jobs) * rounds} runs)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that concurrent solves keep their statistics separate.")
+    parser.add_argument("--boards", type=int, default=2,
+                        help="number of boards generated for each configuration (default: 2)")
+    parser.add_argument("--threads", type=int, default=8, help="number of threads solving at once (default: 8)")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="number of times every job is solved by the threads (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated boards (default: 0)")
+    args = parser.parse_args()
+    exit(main(args.boards, args.threads, args.rounds, args.seed))
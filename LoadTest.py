@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import time
+
+from Sudoku_Board import SudokuBoard, BoardLines
+from Solver.SolveServer import summarize
+
+"""
+    Load generator for the solve server (python -m Solver.SolveServer).
+
+    Opens --concurrency keep-alive connections to the server, each sending
+    one board per request and waiting for its answer before sending the next,
+    until --requests requests were sent or --duration seconds passed. Prints
+    the throughput, the latency percentiles measured by the clients, the
+    stop reasons of the solves and the server's own metrics at the end.
+
+    The boards come from a file of board lines (--lines), or are the sample
+    boards by default, and are sent in turn, as JSON or in the line format.
+"""
+
+
+def load_boards(lines_path):
+    """
+    Returns: the board lines of lines_path, or of the sample boards when lines_path is None
+    """
+    if lines_path is not None:
+        return [BoardLines.formatLine(board) for board in BoardLines.readBoards(lines_path)]
+    sample_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sample_Boards")
+    return [BoardLines.formatLine(SudokuBoard.SudokuBoard(filepath=os.path.join(sample_dir, filename)))
+            for filename in sorted(os.listdir(sample_dir))]
+
+
+def make_request(host, port, line, request_format, timeout):
+    """
+    Returns: the bytes of a POST /solve request for the board line, in request_format "json" or "line"
+    """
+    if request_format == "json":
+        body = json.dumps({"line": line, "timeout": timeout}).encode()
+        target, content_type = "/solve", "application/json"
+    else:
+        body = (line + "\n").encode()
+        target, content_type = f"/solve?timeout={timeout}", "text/plain"
+    return (f"POST {target} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+
+async def read_response(reader):
+    """
+    Returns: the status code and JSON payload of the next response on reader
+    """
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    _, payload = await read_response(reader)
+    writer.close()
+    return payload
+
+
+async def run_client(host, port, requests, next_request, stop_time, latencies, outcomes):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_time:
+            request = next_request()
+            if request is None:
+                break
+            start = time.perf_counter()
+            writer.write(requests[request % len(requests)])
+            await writer.drain()
+            status, payload = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                outcomes[f"HTTP {status}"] += 1
+                continue
+            # a line request is answered with the results of its lines
+            for result in payload.get("results", [payload]):
+                outcomes[result["status"]] += 1
+    finally:
+        writer.close()
+
+
+async def main(host, port, concurrency, num_requests, duration, lines_path, request_format, timeout):
+    lines = load_boards(lines_path)
+    requests = [make_request(host, port, line, request_format, timeout) for line in lines]
+
+    counter = iter(range(num_requests)) if num_requests is not None else itertools.count()
+
+    def next_request():
+        return next(counter, None)
+
+    latencies = []
+    outcomes = collections.Counter()
+    print(f"Sending {num_requests if num_requests is not None else 'unlimited'} requests over {concurrency} "
+          f"connections for up to {duration} seconds, cycling through {len(lines)} boards as {request_format}")
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, requests, next_request, start + duration, latencies, outcomes)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies)
+    print(f"{len(latencies)} requests in {elapsed:.2f} seconds: {len(latencies) / elapsed:.1f} requests per second")
+    print("latency: " + ", ".join(f"{name} {value * 1000:.1f} ms" for name, value in summary.items()))
+    print("results: " + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+
+    metrics = await get_json(host, port, "/metrics")
+    print(f"server: {metrics['batches']} batches of {metrics['meanBatchSize']:.2f} boards on average, "
+          f"max queue depth {metrics['maxQueueDepth']}, "
+          f"queue wait p99 {metrics['queueWait']['p99'] * 1000:.1f} ms, "
+          f"latency p99 {metrics['latency']['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of the solve server.")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port of the server (default: 8080)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="number of connections sending requests at once (default: 16)")
+    parser.add_argument("--requests", type=int, default=1000,
+                        help="number of requests to send, 0 for no limit (default: 1000)")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="seconds after which no more requests are sent (default: 60)")
+    parser.add_argument("--lines", default=None,
+                        help="file of board lines to send (default: the sample boards)")
+    parser.add_argument("--format", choices=("json", "line"), default="json",
+                        help="body of the requests, a JSON object or a board line (default: json)")
+    parser.add_argument("--timeout", type=float, default=10,
+                        help="seconds the server may spend on each board (default: 10)")
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.concurrency, args.requests or None, args.duration, args.lines,
+                     args.format, args.timeout))
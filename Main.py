@@ -1,57 +1,323 @@
-import sys
+import argparse
+import json
 import os
-from Sudoku_Board import SudokuBoard, Trail
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Sudoku_Board import SudokuBoard, Trail, BoardLines
 from Solver.BTSolver import BTSolver
+from Solver.DLXSolver import DLXSolver
+from Solver.PortfolioSolver import PortfolioSolver, PortfolioStats
+from Solver.ParallelSolver import ParallelSolver
+from Solver.SolutionCache import SolutionCache, CachedSolver
+from Solver.SolverStats import SolverStats
 
 # Main driver file, which is responsible for interfacing with the
 # command line and properly starting the backtracking solver.
 
-if __name__ == "__main__":
-    args = sys.argv
+# solvers selectable with --solver
+SOLVERS = ("tournament", "dlx", "portfolio", "parallel")
 
-    file = None
+# SolutionCache of this process, opened on first use when a cache is asked for
+solution_cache = None
 
-    print(os.getcwd())
 
-    if len(args) == 2:
-        file = args[1]
+def getSolutionCache(options):
+    """
+        Returns: the SolutionCache configured by options, or None if the options ask for no cache
+    """
+    global solution_cache
+    if solution_cache is None and (options.cache_size > 0 or options.cache_file is not None):
+        if options.cache_size > 0:
+            solution_cache = SolutionCache(options.cache_size, options.cache_file)
+        else:
+            solution_cache = SolutionCache(path=options.cache_file)
+    return solution_cache
+
+
+def closeSolutionCache():
+    """
+        Prints the counters of this process's SolutionCache, if it has one, and closes its disk tier
+    """
+    if solution_cache is None:
+        return
+    stats = solution_cache.getStats()
+    print("Solution cache: " + str(stats["hits"]) + " memory hits, " + str(stats["diskHits"]) + " disk hits, "
+          + str(stats["misses"]) + " misses, " + str(stats["evictions"]) + " evictions, "
+          + "{:.1%}".format(stats["hitRate"]) + " hit rate", file=sys.stderr)
+    solution_cache.close()
 
-    if file is None:  # solve a random sample_board.txt of size 3x3 with 7 values specified
 
-        sudokudata = SudokuBoard.SudokuBoard(3, 3, 7)
-        trail = Trail.Trail()
-        print(sudokudata)
+def makeSolver(sudokudata, trail, options):
+    """
+        Returns: the solver chosen by options.solver, configured by the other command line options
+    """
+    cache = getSolutionCache(options)
+    if cache is not None:
+        return CachedSolver(sudokudata, trail, cache, lambda gb, tr: makeUncachedSolver(gb, tr, options))
+    return makeUncachedSolver(sudokudata, trail, options)
 
-        solver = BTSolver(sudokudata, trail, "tournVal", "tournVar", "tournCC")
-        solver.checkConsistency()
+
+def makeUncachedSolver(sudokudata, trail, options):
+    if options.solver == "dlx":
+        return DLXSolver(sudokudata, trail)
+    if options.solver == "portfolio":
+        return PortfolioSolver(sudokudata, trail, stats=PortfolioStats(options.portfolio_stats))
+    if options.solver == "parallel":
+        return ParallelSolver(sudokudata, trail, "tournVal", "tournVar", "tournCC", workers=options.search_workers)
+    return BTSolver(sudokudata, trail, "tournVal", "tournVar", "tournCC")
+
+
+def solveBoardFile(filepath, options):
+    """
+        Solves the board in filepath like solveBoard, safe to run in a worker process.
+    """
+    return solveBoard(SudokuBoard.SudokuBoard(filepath=filepath), os.path.basename(filepath), options)
+
+
+def solveBoard(sudokudata, name, options):
+    """
+        Solves sudokudata, or counts its solutions up to options.count when set, profiling the search when
+        options.profile or options.profile_json is set.
+        Returns: a dict with the board's name, the board and its solution (None if not found) as text,
+            the number of solutions counted (None when not counting) and whether the count stopped at options.count,
+            the trail push and backtrack counts, the time spent solving in seconds and the profile of the
+            search as a dict (None when not profiling).
+    """
+    start_time = time.time()
+    trail = Trail.Trail()
+
+    count = None
+    if options.count is not None:
+        solver = makeUncachedSolver(sudokudata, trail, options)
+    else:
+        solver = makeSolver(sudokudata, trail, options)
+    stats = solver.enableProfiling() if options.profile or options.profile_json is not None else None
+
+    solver.checkConsistency()
+    if options.count is not None:
+        count, solutions, _ = solver.countSolutions(options.count)
+        solution = solutions[0] if solutions else None
+    else:
         solver.solve()
+        solution = solver.getSolution() if solver.hassolution else None
+
+    return {
+        "name": name,
+        "board": str(sudokudata),
+        "solution": str(solution) if solution is not None else None,
+        "count": count,
+        "countCapped": count is not None and count >= options.count,
+        "pushes": trail.getPushCount(),
+        "backtracks": trail.getUndoCount(),
+        "time": time.time() - start_time,
+        "winner": getattr(solver, "winner", None),
+        "stats": stats.toDict() if stats is not None else None,
+    }
+
+
+def printResult(result, options):
+    print("Running board: " + str(result["name"]))
+    print(result["board"])
+
+    if result["solution"] is not None:
+        print(result["solution"])
+        if result["count"] is not None:
+            print("Solutions found: " + str(result["count"]) + (" or more" if result["countCapped"] else ""))
+        if result["winner"] is not None:
+            print("Portfolio winner: " + str(result["winner"]))
+        print("Trail Pushes: " + str(result["pushes"]))
+        print("Backtracks: " + str(result["backtracks"]))
+
+    else:
+        print("Failed to find a solution")
+
+    if result["stats"] is not None and options.profile:
+        print(SolverStats.fromDict(result["stats"]))
+
+
+def writeProfiles(filepath, results):
+    """
+        Writes the profiles of results as JSON: the profile of each board by name and their total
+    """
+    total = SolverStats()
+    boards = dict()
+    for result in results:
+        if result["stats"] is not None:
+            boards[result["name"]] = result["stats"]
+            total.merge(SolverStats.fromDict(result["stats"]))
+    with open(filepath, "w") as f:
+        json.dump({"boards": boards, "total": total.toDict()}, f, indent=2)
+
+
+def solveBoardFiles(filepaths, options, profiled=None):
+    """
+        Solves every board file, across a pool of options.workers processes when there is more than one,
+        printing the results as they arrive or in the order of filepaths when options.in_order is set.
+        The results holding a profile are appended to profiled when it is a list.
+        Returns: the number of boards solved
+    """
+    num_solutions = 0
 
-        if solver.hassolution:
-            print(solver.getSolution())
-            print("Trail Pushes: " + str(trail.getPushCount()))
-            print("Backtracks: " + str(trail.getUndoCount()))
+    if options.workers <= 1:
+        for filepath in filepaths:
+            result = solveBoardFile(filepath, options)
+            printResult(result, options)
+            num_solutions += result["solution"] is not None
+            if profiled is not None and result["stats"] is not None:
+                profiled.append(result)
+        return num_solutions
 
+    with ProcessPoolExecutor(max_workers=options.workers) as executor:
+        if options.in_order:
+            results = executor.map(solveBoardFile, filepaths, [options] * len(filepaths))
         else:
-            print("Failed to find a solution")
-        exit(0)
+            futures = [executor.submit(solveBoardFile, filepath, options) for filepath in filepaths]
+            results = (future.result() for future in as_completed(futures))
 
-    elif os.path.isfile(file):
+        for result in results:
+            printResult(result, options)
+            num_solutions += result["solution"] is not None
+            if profiled is not None and result["stats"] is not None:
+                profiled.append(result)
 
-        sudokudata = SudokuBoard.SudokuBoard(filepath=os.path.abspath(file))
-        trail = Trail.Trail()
-        print(sudokudata)
+    return num_solutions
+
+
+def solveLineBoard(sudokudata, options):
+    """
+        Solves one board of a line file, safe to run in a worker process.
+        Returns: the solved board, or None if no solution was found
+    """
+    solver = makeSolver(sudokudata, Trail.Trail(), options)
+    solver.checkConsistency()
+    solver.solve()
+    return solver.getSolution() if solver.hassolution else None
 
-        solver = BTSolver(sudokudata, trail, "tournVal", "tournVar", "tournCC")
-        solver.checkConsistency()
-        solver.solve()
 
-        if solver.hassolution:
-            print(solver.getSolution())
-            print("Trail Pushes: " + str(trail.getPushCount()))
-            print("Backtracks: " + str(trail.getUndoCount()))
+def solveLineFile(filepath, writer, options):
+    """
+        Streams the boards of a one board per line file, writing one line per board to writer in file order,
+        across a pool of options.workers processes when there is more than one. Only a few boards per worker
+        are read ahead of the writer, so memory use does not grow with the size of the file.
+        Returns: the number of boards read and the number solved
+    """
+    num_boards = 0
+    num_solutions = 0
 
+    def record(sudokudata, solution):
+        if solution is not None:
+            writer.write(solution)
         else:
-            print("Failed to find a solution")
+            writer.writeUnsolved(sudokudata)
+        return solution is not None
+
+    if options.workers <= 1:
+        for sudokudata in BoardLines.readBoards(filepath):
+            num_boards += 1
+            num_solutions += record(sudokudata, solveLineBoard(sudokudata, options))
+        return num_boards, num_solutions
+
+    with ProcessPoolExecutor(max_workers=options.workers) as executor:
+        pending = deque()
+        for sudokudata in BoardLines.readBoards(filepath):
+            num_boards += 1
+            pending.append((sudokudata, executor.submit(solveLineBoard, sudokudata, options)))
+            if len(pending) >= 4 * options.workers:
+                sudokudata, future = pending.popleft()
+                num_solutions += record(sudokudata, future.result())
+
+        while pending:
+            sudokudata, future = pending.popleft()
+            num_solutions += record(sudokudata, future.result())
+
+    return num_boards, num_solutions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve sudoku boards.")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="board file or directory of board files, a random board is solved if omitted")
+    parser.add_argument("--solver", choices=SOLVERS, default="tournament",
+                        help="tournament heuristic backtracking solver, dancing links exact cover solver, "
+                             "a portfolio racing several solvers in parallel processes or the tournament solver "
+                             "searching one board across parallel processes")
+    parser.add_argument("--search-workers", type=int, default=None,
+                        help="number of processes searching each board with --solver parallel "
+                             "(default: number of CPU cores)")
+    parser.add_argument("--portfolio-stats", default=None,
+                        help="JSON file keeping the portfolio's wins per board shape, racers are ordered by it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes solving the boards of a directory in parallel")
+    parser.add_argument("--in-order", action="store_true",
+                        help="with --workers, print the results in directory order instead of completion order")
+    parser.add_argument("--count", type=int, default=None,
+                        help="count the solutions of each board up to this number instead of stopping at the first, "
+                             "2 checks that a board has a single solution (tournament and dlx solvers only)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the phases of the tournament solver's search and print them with each board")
+    parser.add_argument("--profile-json", default=None,
+                        help="write the search profile of each board, and their total, to this JSON file")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="number of solutions kept in memory by a cache answering puzzles equivalent to solved "
+                             "ones up to relabeling, line, band and stack swaps and transposition (default: no cache)")
+    parser.add_argument("--cache-file", default=None,
+                        help="dbm file keeping every cached solution across runs, needs --workers 1, "
+                             "implies a cache of 10000 solutions in memory unless --cache-size is given")
+    parser.add_argument("--lines", action="store_true",
+                        help="file holds one board per line, their solutions are written one per line in file order")
+    parser.add_argument("--output", default=None,
+                        help="with --lines, file the solution lines are written to (default: standard output)")
+    args = parser.parse_args()
+    if args.cache_file is not None and args.workers > 1:
+        parser.error("--cache-file cannot be shared by several --workers")
+    if args.count is not None and (args.count < 1 or args.solver not in ("tournament", "dlx") or args.lines):
+        parser.error("--count needs a positive number of solutions, the tournament or dlx solver and no --lines")
+    if (args.profile or args.profile_json is not None) and \
+            (args.solver != "tournament" or args.lines or args.cache_size > 0 or args.cache_file is not None):
+        parser.error("--profile and --profile-json need the tournament solver without a cache and no --lines")
+    profiled = [] if args.profile_json is not None else None
+
+    file = args.file
+
+    # with --lines, standard output holds only the solution lines
+    if not args.lines:
+        print(os.getcwd())
+
+    if file is None:  # solve a random sample_board.txt of size 3x3 with 7 values specified
+
+        result = solveBoard(SudokuBoard.SudokuBoard(3, 3, 7), "random board", args)
+        printResult(result, args)
+        if profiled is not None and result["stats"] is not None:
+            profiled.append(result)
+
+    elif args.lines and os.path.isfile(file):
+
+        output = open(args.output, "w") if args.output is not None else sys.stdout
+        start_time = time.time()
+        try:
+            numBoards, numSolutions = solveLineFile(file, BoardLines.BoardWriter(output), args)
+        except ValueError as e:
+            print("[ERROR] " + str(e), file=sys.stderr)
+            exit(1)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed_time = time.time() - start_time
+
+        # the summary goes to standard error to keep the solution lines alone on standard output
+        print("Solved " + str(numSolutions) + " of " + str(numBoards) + " boards in "
+              + "{:.3f}".format(elapsed_time) + " seconds with " + str(max(args.workers, 1)) + " worker(s), "
+              + "{:.2f}".format(numBoards / elapsed_time if elapsed_time > 0 else 0.0) + " boards per second",
+              file=sys.stderr)
+
+    elif os.path.isfile(file):
+
+        result = solveBoardFile(os.path.abspath(file), args)
+        printResult(result, args)
+        if profiled is not None and result["stats"] is not None:
+            profiled.append(result)
 
     elif os.path.isdir(file):
         listOfBoards = None
@@ -62,30 +328,22 @@ if __name__ == "__main__":
             print("[ERROR] Failed to open directory.")
             exit(1)
 
-        numSolutions = 0
-        for f in listOfBoards:
-            print("Running board: " + str(f))
-            trail = Trail.Trail()
-            sudokudata = SudokuBoard.SudokuBoard(filepath=os.path.join(file, f))
-
-            print(sudokudata)
-            solver = BTSolver(sudokudata, trail, "tournVal", "tournVar", "tournCC")
-            solver.checkConsistency()
-            solver.solve()
-
-            if solver.hassolution:
-                print(solver.getSolution())
-                print("Trail Pushes: " + str(trail.getPushCount()))
-                print("Backtracks: " + str(trail.getUndoCount()))
-                numSolutions += 1
+        start_time = time.time()
+        numSolutions = solveBoardFiles([os.path.join(file, f) for f in listOfBoards], args, profiled)
+        elapsed_time = time.time() - start_time
 
-            else:
-                print("Failed to find a solution")
+        print("Solved " + str(numSolutions) + " of " + str(len(listOfBoards)) + " boards in "
+              + "{:.3f}".format(elapsed_time) + " seconds with " + str(max(args.workers, 1)) + " worker(s), "
+              + "{:.2f}".format(len(listOfBoards) / elapsed_time if elapsed_time > 0 else 0.0) + " boards per second")
 
     else:
         print("Invalid parameters.\n"
               "To solve a random board, run with no command line arguments\n"
               "To solve a specific board, enter the board's file location\n"
               "To solve a set of boards, enter the directory containing the board files\n"
+              "To solve a file of one board per line, add --lines\n"
               )
 
+    if profiled is not None:
+        writeProfiles(args.profile_json, profiled)
+    closeSolutionCache()
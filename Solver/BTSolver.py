@@ -1,11 +1,14 @@
 from Sudoku_Board.Variable import Variable
 from Sudoku_Board.Domain import Domain
 from Sudoku_Board import ConstraintNetwork
-import time
+from Solver import SolveLimits, SolverStats
 
 
 class BTSolver:
 
+    __slots__ = ("network", "hassolution", "gameboard", "trail", "varHeuristics", "valHeuristics", "cChecks",
+                 "solutions", "maxSolutions", "stats", "phases")
+
     # ==================================================================
     # Constructors
     # ==================================================================
@@ -20,16 +23,21 @@ class BTSolver:
         self.valHeuristics = val_sh
         self.cChecks = cc
 
+        self.solutions = []  # board of every solution found, in the order found
+        self.maxSolutions = 1  # the search stops once this many solutions are found
+
+        self.stats = None  # SolverStats of the searches once profiling is enabled
+        # (selectNextVariable, getNextValues, checkConsistency, trail undo) called by the search engines
+        self.phases = None
+        self.bindPhases()
+
     # ==================================================================
     # Consistency Checks
     # ==================================================================
 
     # Basic consistency check, no propagation done
     def assignmentsCheck(self):
-        for c in self.network.getConstraints():
-            if not c.isConsistent():
-                return False
-        return True
+        return self.network.isConsistent()
 
     def forwardChecking(self, last_assigned_vars: [Variable] = None) -> ({str: Domain}, bool):
 
@@ -51,6 +59,8 @@ class BTSolver:
             else [v for v in self.network.getVariables() if v.isAssigned()]
 
         for assigned_var in assigned_vars:
+            value = assigned_var.getAssignment()
+            value_bit = 1 << value
 
             # loop through all the neighbors of assigned vars
             for neighbor in self.network.getNeighborsOfVariable(assigned_var):
@@ -58,14 +68,13 @@ class BTSolver:
                 # if neighbor not an initial variable on sudoku sample_board.txt
                 # and the neighbor is not yet assigned
                 # and neighbor's domain contains the newly assigned variable's value
-                if neighbor.isChangeable and not neighbor.isAssigned() and \
-                        neighbor.getDomain().contains(assigned_var.getAssignment()):
+                if neighbor.isChangeable and not neighbor.isAssigned() and neighbor.domain.bits & value_bit:
                     # Remove the assigned variable's value from the domain of the neighbor and check its domain after
 
                     self.trail.push(neighbor)  # push to trail revert neighbor when backtracking
 
                     # remove assigned variable's value value from neighbor
-                    neighbor.removeValueFromDomain(assigned_var.getAssignment())
+                    neighbor.removeValueFromDomain(value)
 
                     # update output dictionary with new neighbor's domain for grading
                     output_dictionary[neighbor] = neighbor.getDomain()
@@ -73,13 +82,14 @@ class BTSolver:
                     # do some further O(1) checks to see if assignment consistent
 
                     # If the neighbor has no more values in domain, then it's inconsistent since it is unassigned still
-                    if neighbor.domain.size() == 0:
+                    bits = neighbor.domain.bits
+                    if bits == 0:
                         return output_dictionary, False
 
                     # Arc consistency neighbor has only 1 value in domain, assign it and check consistency
-                    elif neighbor.domain.size() == 1:
+                    elif bits & (bits - 1) == 0:
                         self.trail.push(neighbor)  # push to trail so can backtrack later
-                        neighbor.assignValue(neighbor.domain.values[0]) # assign the last remaining value for neighbor
+                        neighbor.assignValue(bits.bit_length() - 1)  # assign the last remaining value for neighbor
                         assigned_vars.append(neighbor)
 
         return output_dictionary, self.assignmentsCheck()
@@ -101,14 +111,16 @@ class BTSolver:
 
         while len(assigned_vars) != 0:
             assigned_var = assigned_vars.pop(0)
+            value = assigned_var.getAssignment()
+            value_bit = 1 << value
             for neighbor in self.network.getNeighborsOfVariable(assigned_var):
-                if neighbor.isChangeable and not neighbor.isAssigned() and neighbor.getDomain().contains(
-                        assigned_var.getAssignment()):
+                if neighbor.isChangeable and not neighbor.isAssigned() and neighbor.domain.bits & value_bit:
                     self.trail.push(neighbor)
-                    neighbor.removeValueFromDomain(assigned_var.getAssignment())
-                    if neighbor.domain.size() == 1:
+                    neighbor.removeValueFromDomain(value)
+                    bits = neighbor.domain.bits
+                    if bits != 0 and bits & (bits - 1) == 0:
                         self.trail.push(neighbor)
-                        neighbor.assignValue(neighbor.domain.values[0])
+                        neighbor.assignValue(bits.bit_length() - 1)
                         assigned_vars.append(neighbor)
         return self.assignmentsCheck()
 
@@ -120,6 +132,8 @@ class BTSolver:
             the square's neighbors.
         (2) If a constraint has only one possible place for a value
             then put the value there.
+        Only the constraints returned by the network's getModifiedConstraints are
+        searched for (2), until a round leaves none modified.
         Returns: a pair of a dictionary and a bool. The dictionary contains all variables that were ASSIGNED during
             the whole NorvigCheck propagation, and mapped to the values that they were assigned.
             The bool is true if assignment is consistent, false otherwise.
@@ -127,41 +141,76 @@ class BTSolver:
 
         output_dict = {}  # output the variables assigned by norvig's check for grading
 
-        if not self.forwardChecking(last_assigned_vars=last_assigned_vars)[1]:
+        assigned_vars = [v for v in last_assigned_vars] if last_assigned_vars is not None\
+            else [v for v in self.network.getVariables() if v.isAssigned()]
+        if not self.eliminateAssignedValues(assigned_vars):
             return output_dict, False
 
-        n = self.gameboard.N  # number of different values each variable can take
-        value_freq = [0] * (n + 1)  # array of values to count up with frequencies
-        has_assigned = 1
-        while has_assigned == 1:
-            has_assigned = 0
-            for c in self.network.getConstraints():
-                for value in range(1, n + 1):
-                    value_freq[value] = 0
-                for var in c.vars:
-                    if not var.isAssigned():
-                        for value in var.getValues():
-                            value_freq[value] += 1  # adds elements in the domain
-
-                for value, count in enumerate(value_freq[1:], start=1):
-                    if count == 1:
-                        vars_to_assign = [var for var in c.vars if value in var.getValues()]
-                        # another assigned var invalidated domain of var, but constraint still needs value
-                        if len(vars_to_assign) == 0:
+        all_values = (1 << (self.gameboard.N + 1)) - 2
+        modified_constraints = self.network.getModifiedConstraints()
+        while len(modified_constraints) != 0:
+            for c in modified_constraints:
+                # a value with no place left in the constraint
+                if c.candidateValues != all_values:
+                    return output_dict, False
+
+                # values held by a single unassigned domain of the constraint, visited in ascending order
+                single_values = c.singleValues & ~c.assignedValues
+                while single_values:
+                    value_bit = single_values & -single_values
+                    single_values ^= value_bit
+                    value = value_bit.bit_length() - 1
+                    # another assigned var invalidated domain of var, but constraint still needs value
+                    if not c.candidateValues & value_bit:
+                        return output_dict, False
+                    # single var found, assign and eliminate its value from its neighbors
+                    if c.singleValues & ~c.assignedValues & value_bit:
+                        var = next(var for var in c.vars if var.domain.bits & value_bit)
+
+                        self.trail.push(var)  # save original var to the trail for backtracking
+                        var.assignValue(value)  # assign the value to the var
+                        output_dict[var] = value  # save to output dict for grading
+                        if not self.eliminateAssignedValues([var]):
                             return output_dict, False
-                        # single var found, assign and do a forward check on it
-                        var = vars_to_assign[0]
-                        if len(vars_to_assign) == 1 and not var.isAssigned():
 
-                            self.trail.push(var)  # save original var to the trail for backtracking
-                            var.assignValue(value)  # assign the value to the var
-                            output_dict[var] = value  # save to output dict for grading
-                            has_assigned = 1
-                            if not self.forwardChecking(last_assigned_vars=[var])[1]:
-                                return output_dict, False
+            # the units whose domains changed this round may hold new single places
+            modified_constraints = self.network.getModifiedConstraints()
 
         return output_dict, True
-    
+
+    def eliminateAssignedValues(self, assigned_vars: [Variable]) -> bool:
+        """
+            Removes the value of each assigned variable from its neighbors, assigning and
+            in turn eliminating the neighbors left with a single value, like forwardChecking.
+            Only the neighbors of the assigned variables are checked for conflicting
+            assignments, rather than every constraint of the network.
+            Returns: false if a domain is emptied or two neighbors share a value, true otherwise
+        """
+        i = 0
+        while i < len(assigned_vars):
+            assigned_var = assigned_vars[i]
+            i += 1
+            value = assigned_var.getAssignment()
+            value_bit = 1 << value
+
+            for neighbor in self.network.getNeighborsOfVariable(assigned_var):
+                if not neighbor.domain.bits & value_bit:
+                    continue
+                if neighbor.isAssigned():
+                    return False
+
+                self.trail.push(neighbor)
+                neighbor.removeValueFromDomain(value)
+                bits = neighbor.domain.bits
+                if bits == 0:
+                    return False
+                elif bits & (bits - 1) == 0:
+                    self.trail.push(neighbor)
+                    neighbor.assignValue(bits.bit_length() - 1)
+                    assigned_vars.append(neighbor)
+
+        return True
+
     def hidden_pair_prune(self):
         """
             If a pair of candidates occurs in exactly two unit cells, and none
@@ -169,22 +218,18 @@ class BTSolver:
             we can eliminate all of the other candidates in the two unit cells
         """
         n = self.gameboard.N  # number of different values each variable can take
-        value_freq = [0] * (n + 1)  # array of values to count up with frequencies
 
         for c in self.network.getConstraints():
             variables_to_consider = dict()
-            for value in range(1, n + 1):
-                value_freq[value] = 0
-            for var in c.vars:
-                if not var.isAssigned():
-                    for value in var.getValues():
-                        value_freq[value] += 1  # adds elements in the domain
+            # unassigned domains holding each value, counted by the constraint as domains change
+            candidate_counts = c.candidateCounts
+            assigned_counts = c.assignedCounts
 
-            for value in range(1, len(value_freq)):
-                count = value_freq[value]
+            for value in range(1, n + 1):
+                count = candidate_counts[value] - assigned_counts[value]
                 if count == 2:  # If a value appears twice, could be a potential hidden pair
                     # There should be two variables in this list
-                    variables_to_consider[value] = [var for var in c.vars if value in var.getValues()
+                    variables_to_consider[value] = [var for var in c.vars if var.getDomain().contains(value)
                                                     and not var.isAssigned()]
                     # Iterate through the stored possible hidden pairs and sees if there is an actual hidden pair
                     for iter_value in variables_to_consider:
@@ -204,13 +249,6 @@ class BTSolver:
 
                                 del variables_to_consider[iter_value]
                                 del variables_to_consider[value]
-                                # Update the counts again, since it would have changed
-                                for value in range(1, n + 1):
-                                    value_freq[value] = 0
-                                for var in c.vars:
-                                    if not var.isAssigned():
-                                        for value in var.getValues():
-                                            value_freq[value] += 1  # adds elements in the domain
                                 break
     
     def naked_pair_pruning(self):
@@ -228,7 +266,7 @@ class BTSolver:
                 value_freq[value] = 0
             for var in c.vars:
                 if not var.isAssigned():
-                    if len(var.getValues()) == 2:
+                    if var.size() == 2:
                         try:
                             pairs_to_consider[tuple(var.getValues())] += 1
                         except KeyError:
@@ -238,11 +276,11 @@ class BTSolver:
                 if value >= 2:  # There might be more than 2 which should result in an automatic backtrack
                     variables_to_consider = [var for var in c.vars if key == tuple(var.getValues())][0:2]
                     for var in c.vars:
-                        if key[0] in var.getValues() and var not in variables_to_consider:
+                        if var.getDomain().contains(key[0]) and var not in variables_to_consider:
                             self.trail.push(var)
                             var.removeValueFromDomain(key[0])
 
-                        if key[1] in var.getValues() and var not in variables_to_consider:
+                        if var.getDomain().contains(key[1]) and var not in variables_to_consider:
                             self.trail.push(var)
                             var.removeValueFromDomain(key[1])
 
@@ -253,11 +291,12 @@ class BTSolver:
              Completing the three tourn heuristic will automatically enter
              your program into a tournament.
         """
-        last_assigned_var = kwargs["last_assigned_var"] if "last_assigned_var" in kwargs else None
+        last_assigned_vars = kwargs["last_assigned_vars"] if "last_assigned_vars" in kwargs else None
 
-        if last_assigned_var is None:  # if initial sample_board.txt, perform arc-consistency
-            if not self.arcConsistency():
-                return False
+        # arc-consistency from every assigned variable on the initial sample_board.txt,
+        # from the last assigned variables afterwards
+        if not self.arcConsistency(last_assigned_vars=last_assigned_vars):
+            return False
 
         if self.gameboard.N > 9:
             self.hidden_pair_prune()
@@ -281,12 +320,8 @@ class BTSolver:
         """
             Returns: The unassigned variable with the smallest domain or None if there are no more variables to assign
         """
-        # returns the minimum var that is unassigned based on its domain size
-        return min(
-            (var for var in self.network.getVariables() if not var.isAssigned()),
-            key=lambda x: x.size(),
-            default=None
-        )
+        # returns the minimum var that is unassigned based on its domain size, kept by the network's bucket queue
+        return self.network.getMRVVariable()
 
     def MRVwithTieBreaker(self):
         """
@@ -296,49 +331,29 @@ class BTSolver:
 
                    If there is only one variable, return the list of size 1 containing that variable.
         """
-        mrv_variable = self.getMRV()
-        if mrv_variable is None:
+        min_remaining_value_vars = self.network.getMRVTies()
+        if len(min_remaining_value_vars) == 0:
             return [None]
 
-        minimum_remaining_var_domain_size = mrv_variable.size()
-        min_remaining_value_vars = [var for var in self.network.getVariables() if
-                                    (var.size() == minimum_remaining_var_domain_size and not var.isAssigned())]
-        maximum_degree = \
-            max(
-                (sum((1 for neighbor in self.network.getNeighborsOfVariable(var) if not neighbor.isAssigned()), 0)
-                 for var in min_remaining_value_vars))
+        # unassigned neighbor counts are kept by the network as variables are assigned and unassigned
+        maximum_degree = max(self.network.getUnassignedDegree(var) for var in min_remaining_value_vars)
 
         return [var for var in min_remaining_value_vars
-                if sum((1 for neighbor in self.network.getNeighborsOfVariable(var) if not neighbor.isAssigned()), 0)
-                == maximum_degree]
+                if self.network.getUnassignedDegree(var) == maximum_degree]
 
     def MRV_LRV(self):
-        mrv_variable = self.getMRV()
-        if mrv_variable is None:
-            return [None]
-
-        minimum_remaining_var_domain_size = mrv_variable.size()
-        min_remaining_value_vars = [var for var in self.network.getVariables() if
-                                    (var.size() == minimum_remaining_var_domain_size and not var.isAssigned())]
+        min_remaining_value_vars = self.network.getMRVTies()
         if len(min_remaining_value_vars) <= 1:
             return min_remaining_value_vars if len(min_remaining_value_vars) != 0 else [None]
 
-        minimum_degree = \
-            min(sum(1 for neighbor in self.network.getNeighborsOfVariable(var) if not neighbor.isAssigned())
-                for var in min_remaining_value_vars)
-        second_tie_break_list = [var for var in min_remaining_value_vars if
-                                 sum(1 for neighbor in self.network.getNeighborsOfVariable(var)
-                                     if not neighbor.isAssigned()) == minimum_degree
-                                 ]
+        minimum_degree = min(self.network.getUnassignedDegree(var) for var in min_remaining_value_vars)
+        second_tie_break_list = [var for var in min_remaining_value_vars
+                                 if self.network.getUnassignedDegree(var) == minimum_degree]
         if len(second_tie_break_list) <= 1:
             return second_tie_break_list if len(second_tie_break_list) != 0 else [None]
 
-        n = self.gameboard.N  # number of different values each variable can take
-        value_freq = [0] * (n + 1)  # array of values to count up with frequencies
-
-        for var in self.network.getVariables():
-            if var.isAssigned():
-                value_freq[var.getAssignment()] += 1
+        # number of variables assigned each value, kept by the network
+        value_freq = self.network.getValueFrequencies()
 
         max_frequency = max((value_freq[value] for var in second_tie_break_list for value in var.getValues()),
                             default=-1)
@@ -362,8 +377,7 @@ class BTSolver:
 
     # Default Value Ordering
     def getValuesInOrder(self, v):
-        values = v.domain.values
-        return sorted(values)
+        return v.domain.values  # bitset domains list their values in ascending order
 
     """
         Part 1 TODO: Implement the Least Constraining Value Heuristic
@@ -377,20 +391,15 @@ class BTSolver:
 
     def getValuesLCVOrder(self, var):
 
-        return list(sorted(
-            (value for value in var.getValues()), key=lambda x:
-            sum(1 for neighbor in self.network.getNeighborsOfVariable(var)
-                if not neighbor.isAssigned() and x in neighbor.getValues()
-                )
-        ))
+        neighbor_domains = [neighbor.domain.bits for neighbor in self.network.getNeighborsOfVariable(var)
+                            if not neighbor.isAssigned()]
+        return sorted(
+            var.getValues(), key=lambda x:
+            sum(1 for bits in neighbor_domains if bits >> x & 1)
+        )
 
     def getValuesMFVOrder(self, v):
-        n = self.gameboard.N  # number of different values each variable can take
-        value_freq = [0] * (n + 1)  # array of values to count up with frequencies
-
-        for var in self.network.getVariables():
-            if var.isAssigned():
-                value_freq[var.getAssignment()] += 1
+        value_freq = self.network.getValueFrequencies()  # number of variables assigned each value
         return sorted((value for value in v.getValues()), key=lambda x: value_freq[x], reverse=True)
 
     def getTournVal(self, v):
@@ -406,25 +415,123 @@ class BTSolver:
     # Engine Functions
     # ==================================================================
 
-    def solve(self, time_left=600):
+    # number of nodes tried between two checks of the clock by solve
+    TIME_CHECK_INTERVAL = 64
+
+    def solve(self, time_left=600, recursive=False):
+        """
+            Searches for a solution within time_left seconds.
+            Returns: 0 when the search finished (check hassolution), -1 if it ran out of time.
+
+            The iterative engine is used by default, it visits the same nodes in the same
+            order as the recursive one without being bound by Python's recursion limit.
+        """
         if time_left <= 0:
             return -1
 
-        start_time = time.time()
+        limits = SolveLimits.SolveLimits(time_limit=time_left, check_interval=self.TIME_CHECK_INTERVAL)
+        result = self.solveWithLimits(limits, recursive=recursive)
+        return -1 if result.reason == SolveLimits.TIMEOUT else 0
+
+    def solveWithLimits(self, limits=None, recursive=False):
+        """
+            Searches for a solution until it is found, the search space is exhausted or one of limits is reached.
+            Returns: a SolveResult with the reason the search stopped and its node, backtrack and push counts
+        """
+        monitor = (limits if limits is not None else SolveLimits.SolveLimits()).start(self.trail)
         if self.hassolution:
-            return 0
+            return monitor.finish(None, True)
+
+        if recursive:
+            reason = self.solveRecursive(monitor)
+        else:
+            reason = self.solveIterative(monitor)
+        return self.finishSearch(monitor, reason, self.hassolution)
+
+    def countSolutions(self, maxSolutions=2, limits=None, recursive=False):
+        """
+            Searches a fresh solver's board for up to maxSolutions solutions, stopping early when one of limits is
+            reached. The search carries on from each solution found to the next, like a backtrack, so it shares
+            the work above every solution instead of starting over. maxSolutions=2 checks uniqueness.
+            Like solveWithLimits, it does not propagate the givens itself: call checkConsistency first, or the
+            search starts from the unpropagated domains and visits far more nodes.
+            Returns: the number of solutions found, their boards, and the SolveResult of the search, whose reason
+                is SOLVED when maxSolutions were found and EXHAUSTED when the board has fewer
+        """
+        self.maxSolutions = maxSolutions
+        monitor = (limits if limits is not None else SolveLimits.SolveLimits()).start(self.trail)
+        if recursive:
+            reason = self.solveRecursive(monitor)
+        else:
+            reason = self.solveIterative(monitor)
+        result = self.finishSearch(monitor, reason, len(self.solutions) >= maxSolutions)
+        return len(self.solutions), list(self.solutions), result
+
+    # Starts profiling the searches of this solver
+    # Returns: the SolverStats the searches add to
+    def enableProfiling(self):
+        if self.stats is None:
+            self.stats = SolverStats.SolverStats()
+            self.bindPhases()
+        return self.stats
+
+    # Returns the SolverStats of the searches, or None when profiling is not enabled
+    def getStats(self):
+        return self.stats
+
+    # Binds the phase functions of the search engines, timed by stats when profiling is enabled
+    def bindPhases(self):
+        stats = self.stats
+        if stats is None:
+            self.phases = (self.selectNextVariable, self.getNextValues, self.checkConsistency, self.trail.undo)
+            return
+        self.phases = (
+            stats.timed(SolverStats.SELECT, self.selectNextVariable),
+            stats.timed(SolverStats.VALUES, self.getNextValues),
+            stats.timedPropagation(self.checkConsistency, self.network, self.trail),
+            stats.timed(SolverStats.UNDO, self.trail.undo),
+        )
+
+    # Returns the SolveResult of the search, recorded in stats when profiling is enabled
+    def finishSearch(self, monitor, reason, hassolution):
+        result = monitor.finish(reason, hassolution)
+        if self.stats is not None:
+            self.stats.record(result)
+        return result
+
+    # Records the solution the network holds
+    # Returns: True when enough solutions were found to stop the search
+    def recordSolution(self):
+        self.solutions.append(self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q))
+        self.hassolution = True
+        return len(self.solutions) >= self.maxSolutions
+
+    def isSearchDone(self):
+        return len(self.solutions) >= self.maxSolutions
+
+    def solveRecursive(self, monitor):
+        """
+            Returns: None when the search below this node finished (check hassolution),
+                or the reason monitor gave to stop
+        """
+        if self.isSearchDone():
+            return None
+        select, getValues, check, undo = self.phases
 
         # Variable Selection
-        v = self.selectNextVariable()
+        v = select()
 
         # check if the assigment is complete
         if v is None:
             # Success
-            self.hassolution = True
-            return 0
+            self.recordSolution()
+            return None
 
         # Attempt to assign a value
-        for i in self.getNextValues(v):
+        for i in getValues(v):
+            reason = monitor.countNode()
+            if reason is not None:
+                return reason
 
             # Store place in trail and push variable's state on trail
             self.trail.placeTrailMarker()  # makes undo backtrack to this position in the trail
@@ -434,20 +541,80 @@ class BTSolver:
             v.assignValue(i)
 
             # Propagate constraints, check consistency, recur
-            if self.checkConsistency(last_assigned_vars=[v]):  # add variable last assigned for optimized checking
-                elapsed_time = time.time() - start_time
-                new_start_time = time_left - elapsed_time
-                if self.solve(time_left=new_start_time) == -1:
-                    return -1
+            if check(last_assigned_vars=[v]):  # add variable last assigned for optimized checking
+                reason = self.solveRecursive(monitor)
+                if reason is not None:
+                    return reason
 
-            # If this assignment succeeded, return
-            if self.hassolution:
-                return 0
+            # If this assignment found the last solution needed, return
+            if self.isSearchDone():
+                return None
 
             # Otherwise backtrack
-            self.trail.undo()
+            undo()
+
+        return None
+
+    def solveIterative(self, monitor):
+        """
+            Returns: None when the search finished (check hassolution), or the reason monitor gave to stop
+        """
+        if self.isSearchDone():
+            return None
+        select, getValues, check, undo = self.phases
+
+        # Variable Selection
+        v = select()
 
-        return 0
+        # check if the assigment is complete
+        if v is None:
+            # Success
+            self.recordSolution()
+            return None
+
+        # each frame holds a variable and the iterator over the values left to try for it,
+        # the value currently assigned to the variable of every frame but the top is on the trail
+        stack = [(v, iter(getValues(v)))]
+
+        while stack:
+            v, values = stack[-1]
+            i = next(values, None)
+
+            # Every value failed, backtrack the assignment made by the frame below
+            if i is None:
+                stack.pop()
+                if stack:
+                    undo()
+                continue
+
+            reason = monitor.countNode()
+            if reason is not None:
+                return reason
+
+            # Store place in trail and push variable's state on trail
+            self.trail.placeTrailMarker()  # makes undo backtrack to this position in the trail
+            self.trail.push(v)
+
+            # Assign the value
+            v.assignValue(i)
+
+            # Propagate constraints, check consistency, descend
+            if check(last_assigned_vars=[v]):  # add variable last assigned for optimized checking
+                next_v = select()
+                if next_v is None:
+                    # Success, stop or carry on with the next value of v as if this one had failed
+                    if self.recordSolution():
+                        return None
+                    undo()
+                    continue
+
+                stack.append((next_v, iter(getValues(next_v))))
+                continue
+
+            # Otherwise backtrack
+            undo()
+
+        return None
 
     def checkConsistency(self, last_assigned_vars: [Variable] = None):
 
@@ -487,4 +654,6 @@ class BTSolver:
             return self.getValuesInOrder(v)
 
     def getSolution(self):
+        if self.solutions:
+            return self.solutions[0]
         return self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q)
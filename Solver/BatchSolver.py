@@ -0,0 +1,216 @@
+from Sudoku_Board import SudokuBoard
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed by this solver
+    numpy = None
+
+"""
+    Vectorized solver for many boards of the same shape at once.
+
+    The candidates of B boards are held in one integer bitmask array of shape
+    (B, N, N), bit value - 1 of cand[b, row, col] being set while value is
+    still possible for the cell. Naked singles (eliminating a fixed value from
+    the cell's row, column and block) and hidden singles (a value with one
+    place left in a unit) are propagated for every board together with array
+    operations. Only the boards that are stuck after propagation branch: the
+    cell with the fewest candidates is set to its smallest value and the board
+    with that value removed is saved on the board's own stack, to be restored
+    when the guess leads to a contradiction.
+
+    Requires numpy.
+"""
+
+class BatchSolver:
+
+    __slots__ = ("boards", "p", "q", "N", "dtype", "full", "cand", "solutions", "stats")
+
+    # propagation outcome of a board
+    STUCK = 0
+    SOLVED = 1
+    CONTRADICTION = -1
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, boards):
+        if numpy is None:
+            raise ImportError("BatchSolver requires numpy")
+        if len(boards) == 0:
+            raise ValueError("BatchSolver needs at least one board")
+
+        self.boards = boards
+        self.p = boards[0].p
+        self.q = boards[0].q
+        self.N = boards[0].N
+        for gb in boards:
+            if gb.p != self.p or gb.q != self.q:
+                raise ValueError("Every board of a batch must have the same p x q block shape")
+
+        n = self.N
+        self.dtype = numpy.uint32 if n < 32 else numpy.uint64
+        self.full = self.dtype((1 << n) - 1)
+
+        givens = numpy.array([gb.board for gb in boards], dtype=numpy.int64).reshape(len(boards), n, n)
+        given_bits = numpy.left_shift(1, numpy.maximum(givens - 1, 0)).astype(self.dtype)
+        self.cand = numpy.where(givens != 0, given_bits, self.full).astype(self.dtype)
+
+        self.solutions = [None] * len(boards)
+        self.stats = [{"solved": False, "guesses": 0, "backtracks": 0, "rounds": 0} for _ in boards]
+
+    # ==================================================================
+    # Unit Helpers
+    # ==================================================================
+
+    # Returns the cells of every row, column and block as three (S, N units, N cells) arrays
+    def units(self, m):
+        s = m.shape[0]
+        p, q, n = self.p, self.q, self.N
+        blocks = m.reshape(s, q, p, p, q).transpose(0, 1, 3, 2, 4).reshape(s, n, n)
+        return m, m.transpose(0, 2, 1), blocks
+
+    # Spreads per unit (S, N) row, column and block values back onto the (S, N, N) cells
+    def toCells(self, rows, cols, blocks):
+        s = rows.shape[0]
+        p, q, n = self.p, self.q, self.N
+        block_cells = numpy.broadcast_to(blocks.reshape(s, q, 1, p, 1), (s, q, p, p, q)).reshape(s, n, n)
+        return rows[:, :, None] | cols[:, None, :] | block_cells
+
+    # Returns the bits set in at least one and in at least two of the cells of each unit
+    def onceTwice(self, unit_cells):
+        once = numpy.zeros(unit_cells.shape[:2], dtype=self.dtype)
+        twice = numpy.zeros(unit_cells.shape[:2], dtype=self.dtype)
+        for k in range(unit_cells.shape[2]):
+            cell = unit_cells[:, :, k]
+            twice |= once & cell
+            once |= cell
+        return once, twice
+
+    # ==================================================================
+    # Propagation
+    # ==================================================================
+
+    def propagate(self, cand):
+        """
+            Applies naked and hidden singles to the (S, N, N) candidates in place until no board changes.
+            Returns: the STUCK, SOLVED or CONTRADICTION outcome and the number of rounds of each board.
+        """
+        zero = self.dtype(0)
+        one = self.dtype(1)
+        status = numpy.full(cand.shape[0], BatchSolver.STUCK, dtype=numpy.int8)
+        rounds = numpy.zeros(cand.shape[0], dtype=numpy.int64)
+        work = numpy.arange(cand.shape[0])
+
+        while len(work) != 0:
+            m = cand[work]
+            rounds[work] += 1
+            bad = numpy.zeros(len(work), dtype=bool)
+
+            # Naked singles, drop every fixed value from the other cells of its units
+            fixed = numpy.where(m & (m - one) == zero, m, zero)
+            seen = []
+            for unit_cells in self.units(fixed):
+                once, twice = self.onceTwice(unit_cells)
+                bad |= (twice != zero).any(axis=1)
+                seen.append(once)
+            new = numpy.where(fixed != zero, m, m & ~self.toCells(*seen))
+
+            # Hidden singles, a value with a single place left in a unit is placed there
+            exactly_once = []
+            for unit_cells in self.units(new):
+                once, twice = self.onceTwice(unit_cells)
+                bad |= (once != self.full).any(axis=1)
+                exactly_once.append(once & ~twice)
+            hidden = new & self.toCells(*exactly_once)
+            bad |= (hidden & (hidden - one) != zero).any(axis=(1, 2))
+            new = numpy.where(hidden != zero, hidden, new)
+            bad |= (new == zero).any(axis=(1, 2))
+
+            changed = (new != m).any(axis=(1, 2))
+            cand[work] = new
+            status[work[bad]] = BatchSolver.CONTRADICTION
+            work = work[changed & ~bad]
+
+        unsettled = numpy.nonzero(status == BatchSolver.STUCK)[0]
+        m = cand[unsettled]
+        solved = (m & (m - one) == zero).all(axis=(1, 2))
+        status[unsettled[solved]] = BatchSolver.SOLVED
+        return status, rounds
+
+    # Returns the number of candidates of each cell
+    def popcount(self, m):
+        if hasattr(numpy, "bitwise_count"):
+            return numpy.bitwise_count(m)
+        counts = numpy.zeros(m.shape, dtype=numpy.int64)
+        while m.any():
+            counts += (m & 1).astype(numpy.int64)
+            m = m >> 1
+        return counts
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    def solve(self):
+        """
+            Solves every board of the batch.
+            Returns: the number of boards solved
+        """
+        cand = self.cand
+        n = self.N
+        stacks = [[] for _ in self.boards]
+        active = numpy.arange(len(self.boards))
+
+        while len(active) != 0:
+            states = cand[active]
+            status, rounds = self.propagate(states)
+            cand[active] = states
+
+            still_active = []
+            stuck = []
+            for k, b in enumerate(active.tolist()):
+                stats = self.stats[b]
+                stats["rounds"] += int(rounds[k])
+                if status[k] == BatchSolver.SOLVED:
+                    stats["solved"] = True
+                    self.solutions[b] = (numpy.log2(states[k]).astype(numpy.int64) + 1).tolist()
+                    stacks[b] = []
+                elif status[k] == BatchSolver.CONTRADICTION:
+                    if stacks[b]:
+                        cand[b] = stacks[b].pop()
+                        stats["backtracks"] += 1
+                        still_active.append(b)
+                else:
+                    stuck.append(b)
+                    still_active.append(b)
+
+            # Branch the stuck boards on the cell with the fewest candidates, trying its smallest value first
+            if stuck:
+                stuck = numpy.array(stuck)
+                counts = self.popcount(cand[stuck]).reshape(len(stuck), n * n)
+                counts[counts <= 1] = n + 1
+                cells = counts.argmin(axis=1)
+                rows, cols = cells // n, cells % n
+                masks = cand[stuck, rows, cols]
+                lowest = masks & (~masks + self.dtype(1))
+                for b, row, col, mask, bit in zip(stuck.tolist(), rows.tolist(), cols.tolist(),
+                                                  masks.tolist(), lowest.tolist()):
+                    alternative = cand[b].copy()
+                    alternative[row, col] = mask ^ bit
+                    stacks[b].append(alternative)
+                    self.stats[b]["guesses"] += 1
+                cand[stuck, rows, cols] = lowest
+
+            active = numpy.array(still_active, dtype=numpy.int64)
+
+        return sum(1 for stats in self.stats if stats["solved"])
+
+    # Returns the solved boards, None for the boards without a solution
+    def getSolutions(self):
+        return [SudokuBoard.SudokuBoard(self.p, self.q, board=solution) if solution is not None else None
+                for solution in self.solutions]
+
+    # Returns for each board whether it was solved and its number of propagation rounds, guesses and backtracks
+    def getStats(self):
+        return self.stats
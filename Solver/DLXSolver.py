@@ -0,0 +1,322 @@
+from Sudoku_Board import SudokuBoard
+from Solver import SolveLimits
+
+"""
+    Exact cover solver for sudoku boards using Knuth's Dancing Links (Algorithm X).
+
+    Every (cell, value) candidate is a row covering four columns: the cell, the
+    value in the cell's row, the value in the cell's column and the value in the
+    cell's block. The links are kept in flat lists indexed by node id, node 0 is
+    the root header and nodes 1..4*N*N are the column headers.
+
+    Follows the BTSolver interface (checkConsistency, solve, hassolution,
+    getSolution) so it can be swapped in wherever a BTSolver is used. Each
+    row choice places a marker on the trail and each abandoned choice undoes
+    it, so trail.getUndoCount() reports backtracks like it does for BTSolver.
+
+    countSolutions keeps searching past the first solution, up to a cap, which
+    is how uniqueness is checked. Given a random.Random, the cells are linked
+    in random order, the candidates of each cell are tried in random order
+    and ties between the smallest columns are broken at random, so an empty
+    board is filled with a random grid rather than a shifted pattern.
+"""
+
+class DLXSolver:
+
+    __slots__ = ("gameboard", "trail", "rng", "hassolution", "solution", "solutions", "inconsistent", "L", "R", "U",
+                 "D", "C", "S", "candidate")
+
+    # number of rows tried between two checks of the clock
+    TIME_CHECK_INTERVAL = 256
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, gb, trail=None, rng=None):
+        """
+            @param rng random.Random randomizing the order cells and values are tried in, None keeps board order
+        """
+        self.gameboard = gb
+        self.trail = trail
+        self.rng = rng
+        self.hassolution = False
+        self.solution = None
+        self.solutions = []  # board of every solution found, in the order found
+
+        # True once the given values of the board were found to conflict with each other
+        self.inconsistent = False
+
+        self.buildLinks()
+
+    def buildLinks(self):
+        gb = self.gameboard
+        n = gb.N
+        num_columns = 4 * n * n
+
+        # circular doubly linked lists over the nodes, C is a node's column header, S a column's size
+        self.L = L = list(range(-1, num_columns))
+        self.R = R = list(range(1, num_columns + 2))
+        L[0] = num_columns
+        R[num_columns] = 0
+        self.U = U = list(range(num_columns + 1))
+        self.D = D = list(range(num_columns + 1))
+        self.C = C = list(range(num_columns + 1))
+        self.S = S = [0] * (num_columns + 1)
+        # (cell, value) candidate of each node, None for headers
+        self.candidate = candidate = [None] * (num_columns + 1)
+
+        board = gb.board
+        row_used = [0] * n
+        col_used = [0] * n
+        block_used = [0] * n
+        for i in range(n):
+            for j in range(n):
+                value = board[i][j]
+                if value != 0:
+                    bit = 1 << value
+                    block = self.blockOf(i, j)
+                    if (row_used[i] | col_used[j] | block_used[block]) & bit:
+                        self.inconsistent = True
+                    row_used[i] |= bit
+                    col_used[j] |= bit
+                    block_used[block] |= bit
+
+        cells = [(i, j) for i in range(n) for j in range(n)]
+        if self.rng is not None:
+            self.rng.shuffle(cells)
+
+        given_rows = []
+        for i, j in cells:
+            block = self.blockOf(i, j)
+            given = board[i][j]
+            if given != 0:
+                values = [given]
+            else:
+                used = row_used[i] | col_used[j] | block_used[block]
+                values = [value for value in range(1, n + 1) if not used >> value & 1]
+                if self.rng is not None:
+                    self.rng.shuffle(values)
+
+            cell = i * n + j
+            for value in values:
+                columns = (
+                    1 + cell,
+                    1 + n * n + i * n + value - 1,
+                    1 + 2 * n * n + j * n + value - 1,
+                    1 + 3 * n * n + block * n + value - 1,
+                )
+                first = len(C)
+                for k, column in enumerate(columns):
+                    node = first + k
+                    L.append(node - 1 if k > 0 else first + 3)
+                    R.append(node + 1 if k < 3 else first)
+                    U.append(U[column])
+                    D.append(column)
+                    D[U[column]] = node
+                    U[column] = node
+                    C.append(column)
+                    S[column] += 1
+                    candidate.append((cell, value))
+                if given != 0:
+                    given_rows.append(first)
+
+        # the givens are part of every solution, take their rows out for good
+        if not self.inconsistent:
+            for row in given_rows:
+                self.cover(C[row])
+                j = R[row]
+                while j != row:
+                    self.cover(C[j])
+                    j = R[j]
+
+    def blockOf(self, i, j):
+        gb = self.gameboard
+        return (i // gb.p) * gb.p + j // gb.q
+
+    # ==================================================================
+    # Dancing Links
+    # ==================================================================
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[c]] = R[c]
+        L[R[c]] = L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = c
+        L[R[c]] = c
+
+    # Returns the uncovered column with the fewest rows, or 0 when every column is covered. With an rng, ties are
+    # broken uniformly at random instead of by column order.
+    def chooseColumn(self):
+        R, S = self.R, self.S
+        rng = self.rng
+        best = 0
+        best_size = -1
+        ties = 0
+        c = R[0]
+        while c != 0:
+            size = S[c]
+            if best_size == -1 or size < best_size:
+                best = c
+                best_size = size
+                ties = 1
+                if size == 0 or (size == 1 and rng is None):
+                    break
+            elif size == best_size and rng is not None:
+                ties += 1
+                if rng.randrange(ties) == 0:
+                    best = c
+            c = R[c]
+        return best
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    def checkConsistency(self, **kwargs):
+        return not self.inconsistent
+
+    def solve(self, time_left=600):
+        """
+            Searches for a solution within time_left seconds.
+            Returns: 0 when the search finished (check hassolution), -1 if it ran out of time.
+        """
+        if time_left <= 0:
+            return -1
+
+        limits = SolveLimits.SolveLimits(time_limit=time_left, check_interval=self.TIME_CHECK_INTERVAL)
+        return -1 if self.solveWithLimits(limits).reason == SolveLimits.TIMEOUT else 0
+
+    def solveWithLimits(self, limits=None):
+        """
+            Searches for a solution until it is found, the search space is exhausted or one of limits is reached.
+            Each row chosen is a node, backtracks are counted on the trail when there is one.
+            Returns: a SolveResult with the reason the search stopped and its node, backtrack and push counts
+        """
+        if self.hassolution:
+            monitor = (limits if limits is not None else SolveLimits.SolveLimits()).start(self.trail)
+            return monitor.finish(None, True)
+        return self.search(limits, 1)
+
+    def countSolutions(self, maxSolutions=2, limits=None):
+        """
+            Searches a fresh solver's board for up to maxSolutions solutions, stopping early when one of limits is
+            reached. maxSolutions=2 checks uniqueness.
+            Returns: the number of solutions found, their boards, and the SolveResult of the search, whose reason
+                is SOLVED when maxSolutions were found and EXHAUSTED when the board has fewer
+        """
+        result = self.search(limits, maxSolutions)
+        p, q = self.gameboard.p, self.gameboard.q
+        return len(self.solutions), [SudokuBoard.SudokuBoard(p, q, board=board) for board in self.solutions], result
+
+    def search(self, limits, maxSolutions):
+        """
+            Searches until maxSolutions solutions are found, the search space is exhausted or one of limits is reached
+            Returns: the SolveResult of the search
+        """
+        monitor = (limits if limits is not None else SolveLimits.SolveLimits()).start(self.trail)
+        if self.inconsistent:
+            return monitor.finish(None, False)
+
+        R, D, C = self.R, self.D, self.C
+
+        if R[0] == 0:
+            self.recordSolution([])
+            return monitor.finish(None, maxSolutions <= 1)
+
+        chosen_rows = []
+        c = self.chooseColumn()
+        self.cover(c)
+        r = D[c]
+
+        while True:
+            # Every row of column c was tried, backtrack the row chosen before it
+            if r == c:
+                self.uncover(c)
+                if not chosen_rows:
+                    return monitor.finish(None, False)
+                r = chosen_rows.pop()
+                self.unselectRow(r)
+                if self.trail is not None:
+                    self.trail.undo()
+                c = C[r]
+                r = D[r]
+                continue
+
+            reason = monitor.countNode()
+            if reason is not None:
+                return monitor.finish(reason, False)
+
+            # Choose row r
+            if self.trail is not None:
+                self.trail.placeTrailMarker()
+            chosen_rows.append(r)
+            self.selectRow(r)
+
+            if R[0] == 0:
+                self.recordSolution(chosen_rows)
+                if len(self.solutions) >= maxSolutions:
+                    return monitor.finish(None, True)
+
+                # keep searching past this solution as if row r had failed
+                chosen_rows.pop()
+                self.unselectRow(r)
+                if self.trail is not None:
+                    self.trail.undo()
+                r = D[r]
+                continue
+
+            c = self.chooseColumn()
+            self.cover(c)
+            r = D[c]
+
+    def selectRow(self, r):
+        R, C = self.R, self.C
+        j = R[r]
+        while j != r:
+            self.cover(C[j])
+            j = R[j]
+
+    def unselectRow(self, r):
+        L, C = self.L, self.C
+        j = L[r]
+        while j != r:
+            self.uncover(C[j])
+            j = L[j]
+
+    def recordSolution(self, chosen_rows):
+        n = self.gameboard.N
+        board = [[value for value in row] for row in self.gameboard.board]
+        for r in chosen_rows:
+            cell, value = self.candidate[r]
+            board[cell // n][cell % n] = value
+        if not self.hassolution:
+            self.solution = board
+        self.solutions.append(board)
+        self.hassolution = True
+
+    # Returns the solution, or a copy of the board's givens when none was found
+    def getSolution(self):
+        board = self.solution if self.hassolution else [list(row) for row in self.gameboard.board]
+        return SudokuBoard.SudokuBoard(self.gameboard.p, self.gameboard.q, board=board)
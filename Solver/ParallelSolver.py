@@ -0,0 +1,280 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from Sudoku_Board import SudokuBoard, Trail
+from Solver.BTSolver import BTSolver
+
+"""
+    Splits the search of a single board across worker processes.
+
+    The parent runs the initial consistency check, selects the first variable
+    and queues one task per value from getNextValues. A task is a serialized
+    network state (ConstraintNetwork.captureState's arrays) with a
+    variable and the values left to try for it. Each worker keeps one BTSolver
+    and searches a task's subtree depth first, in the same way as
+    BTSolver.solveIterative.
+
+    Every STEAL_CHECK_INTERVAL nodes a worker looks for idle workers. If some
+    are waiting and the task queue is empty, it gives away the untried values
+    of its shallowest frame, serialized together with the state that frame
+    started from. The first worker to complete an assignment stops all the
+    others, which check for the stop at every node.
+"""
+
+
+class SearchWorker:
+
+    __slots__ = ("trail", "solver", "network", "tasks", "results", "stop", "idle", "pending", "totals", "reportedPushes",
+                 "reportedUndos")
+
+    # number of nodes expanded between two checks for an idle worker to feed
+    STEAL_CHECK_INTERVAL = 16
+
+    def __init__(self, gb, setting, tasks, results, stop, idle, pending, totals):
+        consistency_check, variable_heuristic, value_heuristic = setting
+        self.trail = Trail.Trail(Trail.Trail.DELTA)
+        self.solver = BTSolver(gb, self.trail, value_heuristic, variable_heuristic, consistency_check)
+        self.network = self.solver.network
+
+        self.tasks = tasks
+        self.results = results
+        self.stop = stop
+        self.idle = idle
+        self.pending = pending
+        self.totals = totals
+        self.reportedPushes = 0
+        self.reportedUndos = 0
+
+    def run(self):
+        while not self.stop.is_set():
+            with self.idle.get_lock():
+                self.idle.value += 1
+            try:
+                task = self.tasks.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            finally:
+                with self.idle.get_lock():
+                    self.idle.value -= 1
+
+            state, var_index, values = task
+            self.network.restoreState(state)
+            self.trail.clear()
+
+            if self.search(self.network.variables[var_index], values):
+                self.stop.set()
+                self.results.put(("solution", self.solver.getSolution().board))
+
+            self.reportCounts()
+            with self.pending.get_lock():
+                self.pending.value -= 1
+                exhausted = self.pending.value == 0
+            if exhausted:
+                self.results.put(("exhausted", None))
+
+        self.reportCounts()
+
+    def reportCounts(self):
+        pushes = self.trail.getPushCount()
+        undos = self.trail.getUndoCount()
+        with self.totals.get_lock():
+            self.totals[0] += pushes - self.reportedPushes
+            self.totals[1] += undos - self.reportedUndos
+        self.reportedPushes = pushes
+        self.reportedUndos = undos
+
+    def search(self, v, values):
+        """
+            Depth first search of the subtrees of assigning v to each of values.
+            Returns: True if a complete consistent assignment was found
+        """
+        solver = self.solver
+        trail = self.trail
+        nodes_until_check = self.STEAL_CHECK_INTERVAL
+
+        # frames of [variable, values to try, index of the next value to try]
+        stack = [[v, values, 0]]
+
+        while stack:
+            if self.stop.is_set():
+                return False
+
+            frame = stack[-1]
+            v, values, next_value = frame
+            if next_value == len(values):
+                stack.pop()
+                if stack:
+                    trail.undo()
+                continue
+            frame[2] += 1
+
+            trail.placeTrailMarker()
+            trail.push(v)
+            v.assignValue(values[next_value])
+
+            if solver.checkConsistency(last_assigned_vars=[v]):
+                next_v = solver.selectNextVariable()
+                if next_v is None:
+                    return True
+
+                stack.append([next_v, solver.getNextValues(next_v), 0])
+
+                nodes_until_check -= 1
+                if nodes_until_check == 0:
+                    nodes_until_check = self.STEAL_CHECK_INTERVAL
+                    if self.idle.value > 0 and self.tasks.empty():
+                        self.donate(stack)
+                continue
+
+            trail.undo()
+
+        return False
+
+    # Queues the untried values of the shallowest frame that has any as a new task
+    def donate(self, stack):
+        for depth, frame in enumerate(stack):
+            v, values, next_value = frame
+            if next_value < len(values):
+                break
+        else:
+            return
+
+        # the state frame depth started from, every frame below the top holds one marker on the trail
+        bits, assignments = self.network.captureState()
+        if depth < len(self.trail.trailMarker):
+            for x, x_bits, x_assigned in reversed(self.trail.trailStack[self.trail.trailMarker[depth]:]):
+                bits[x.index] = x_bits
+                assignments[x.index] = x_bits if x_assigned else 0
+
+        with self.pending.get_lock():
+            self.pending.value += 1
+        self.tasks.put(((bits, assignments), v.index, values[next_value:]))
+        frame[1] = values[:next_value]
+
+
+def runWorker(gb, setting, tasks, results, stop, idle, pending, totals):
+    SearchWorker(gb, setting, tasks, results, stop, idle, pending, totals).run()
+
+
+class ParallelSolver:
+
+    __slots__ = ("gameboard", "trail", "setting", "workers", "solver", "network", "hassolution", "solution", "consistent")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, gb, trail, val_sh, var_sh, cc, workers=None):
+        self.gameboard = gb
+        self.trail = trail
+        self.setting = (cc, var_sh, val_sh)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+        # the parent's network runs the initial propagation and splits the first choice
+        self.solver = BTSolver(gb, Trail.Trail(Trail.Trail.DELTA), val_sh, var_sh, cc)
+        self.network = self.solver.network
+        self.hassolution = False
+        self.solution = None
+        self.consistent = True
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    def checkConsistency(self, **kwargs):
+        self.consistent = self.solver.checkConsistency(**kwargs)
+        return self.consistent
+
+    def solve(self, time_left=600):
+        """
+            Searches for a solution with the worker processes within time_left seconds.
+            Returns: 0 when the search finished (check hassolution), -1 if it ran out of time.
+            Raises RuntimeError if every worker died before the search finished
+        """
+        if time_left <= 0:
+            return -1
+
+        if self.hassolution or not self.consistent:
+            return 0
+
+        deadline = time.time() + time_left
+        v = self.solver.selectNextVariable()
+        if v is None:
+            self.hassolution = True
+            self.solution = self.solver.getSolution().board
+            return 0
+
+        tasks = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        idle = multiprocessing.Value("i", 0)
+        pending = multiprocessing.Value("i", 0)
+        totals = multiprocessing.Array("q", 2)
+
+        # one task per value of the first variable
+        state = self.network.captureState()
+        values = self.solver.getNextValues(v)
+        pending.value = len(values)
+        for value in values:
+            tasks.put((state, v.index, [value]))
+
+        workers = []
+        for _ in range(self.workers):
+            worker = multiprocessing.Process(
+                target=runWorker, args=(self.gameboard, self.setting, tasks, results, stop, idle, pending, totals)
+            )
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        status = -1
+        try:
+            while True:
+                time_left = deadline - time.time()
+                if time_left <= 0:
+                    break
+                try:
+                    kind, board = results.get(timeout=min(0.5, time_left))
+                except queue.Empty:
+                    # workers only exit once stopped, so none being left means they all crashed
+                    if results.empty() and not any(worker.is_alive() for worker in workers):
+                        raise RuntimeError("Every search worker died before the search finished")
+                    continue
+
+                status = 0
+                if kind == "solution":
+                    self.hassolution = True
+                    self.solution = board
+                break
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+
+            # tasks no worker took are left in the queue, and the feeder thread still writing this process's
+            # tasks to the pipe would keep the interpreter from exiting once nothing reads them
+            try:
+                while True:
+                    tasks.get_nowait()
+            except (queue.Empty, OSError, EOFError):
+                pass
+            tasks.cancel_join_thread()
+            tasks.close()
+            results.close()
+
+        # report the work of every worker through the caller's trail
+        if self.trail is not None:
+            self.trail.numPush += totals[0]
+            self.trail.numUndo += totals[1]
+
+        return status
+
+    # Returns the solution, or a copy of the board's givens when none was found
+    def getSolution(self):
+        board = self.solution if self.hassolution else [list(row) for row in self.gameboard.board]
+        return SudokuBoard.SudokuBoard(self.gameboard.p, self.gameboard.q, board=board)
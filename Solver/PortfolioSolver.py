@@ -0,0 +1,235 @@
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from Sudoku_Board import SudokuBoard, Trail
+from Solver import BTSolver, DLXSolver
+
+"""
+    Races several solver configurations on the same board, each in its own
+    process, and keeps the first solution found. The other racers are
+    terminated as soon as one succeeds.
+
+    Wins are counted per board shape in a PortfolioStats object, optionally
+    saved to a JSON file, so the configurations can be raced in order of past
+    wins and the portfolio trimmed to the configurations that keep winning.
+"""
+
+# (consistency check, variable selection heuristic, value selection heuristic) of each racer,
+# in the format of Benchmark.py's solver_settings
+DEFAULT_CONFIGURATIONS = {
+    "TOURNAMENT1": ("tournCC", "tournVar", "tournVal"),
+    "NOR MAD LCV": ("norvigCheck", "MRVwithTieBreaker", "LeastConstrainingValue"),
+    "NOR MRV": ("norvigCheck", "MinimumRemainingValue", ""),
+    "FC MRV LCV": ("forwardChecking", "MinimumRemainingValue", "LeastConstrainingValue"),
+    "DLX": ("dancingLinks", "", ""),
+}
+
+
+def makeSolver(gb, trail, setting):
+    consistency_check, variable_heuristic, value_heuristic = setting
+
+    if consistency_check == "dancingLinks":
+        return DLXSolver.DLXSolver(gb, trail)
+    return BTSolver.BTSolver(gb, trail, value_heuristic, variable_heuristic, consistency_check)
+
+
+def race(name, setting, gb, time_left, results):
+    """
+        Solves gb with one configuration and reports back on the results queue as
+        (name, solution board or None, trail pushes, backtracks, seconds taken).
+    """
+    start_time = time.time()
+    trail = Trail.Trail()
+    solver = makeSolver(gb, trail, setting)
+    solver.checkConsistency()
+    solver.solve(time_left=time_left)
+
+    solution = solver.getSolution().board if solver.hassolution else None
+    results.put((name, solution, trail.getPushCount(), trail.getUndoCount(), time.time() - start_time))
+
+
+class PortfolioStats:
+
+    __slots__ = ("filepath", "wins", "unsaved")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.wins = self.load()  # board shape ("pxq") -> configuration name -> wins
+        self.unsaved = dict()  # wins recorded since the last save, in the same format
+
+    def load(self):
+        if self.filepath is None or not os.path.isfile(self.filepath):
+            return dict()
+        with open(self.filepath) as f:
+            return json.load(f)
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    @staticmethod
+    def shapeOf(gb):
+        return str(gb.p) + "x" + str(gb.q)
+
+    def getWins(self, shape):
+        return self.wins.get(shape, dict())
+
+    # Returns names ordered by most wins on the shape first, ties keep the order of names
+    def order(self, shape, names):
+        wins = self.getWins(shape)
+        return sorted(names, key=lambda name: -wins.get(name, 0))
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    def recordWin(self, shape, name):
+        for wins in (self.wins, self.unsaved):
+            shape_wins = wins.setdefault(shape, dict())
+            shape_wins[name] = shape_wins.get(name, 0) + 1
+
+    # Adds the wins recorded since the last save to the file, keeping wins saved meanwhile by other processes
+    def save(self):
+        if self.filepath is None:
+            return
+
+        wins = self.load()
+        for shape, shape_unsaved in self.unsaved.items():
+            shape_wins = wins.setdefault(shape, dict())
+            for name, count in shape_unsaved.items():
+                shape_wins[name] = shape_wins.get(name, 0) + count
+
+        temp_path = self.filepath + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(wins, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.filepath)
+
+        self.wins = wins
+        self.unsaved = dict()
+
+
+class PortfolioSolver:
+
+    __slots__ = ("gameboard", "trail", "configurations", "stats", "maxRacers", "hassolution", "solution", "winner",
+                 "winnerTime")
+
+    # seconds between two checks that the racers are still alive while waiting for results
+    POLL_INTERVAL = 0.5
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, gb, trail=None, configurations=None, stats=None, maxRacers=None):
+        """
+            @param configurations dict of racer names to solver settings, DEFAULT_CONFIGURATIONS if None
+            @param stats PortfolioStats updated with each win and used to order the racers
+            @param maxRacers only race this many configurations, those with the most wins on the board's shape
+        """
+        self.gameboard = gb
+        self.trail = trail
+        self.configurations = configurations if configurations is not None else DEFAULT_CONFIGURATIONS
+        self.stats = stats if stats is not None else PortfolioStats()
+        self.maxRacers = maxRacers
+
+        self.hassolution = False
+        self.solution = None
+        self.winner = None
+        self.winnerTime = None
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    # Returns the configuration names to race, best performers on the board's shape first
+    def getRacers(self):
+        names = self.stats.order(PortfolioStats.shapeOf(self.gameboard), list(self.configurations))
+        if self.maxRacers is not None:
+            names = names[:self.maxRacers]
+        return names
+
+    def checkConsistency(self, **kwargs):
+        return True
+
+    def solve(self, time_left=600):
+        """
+            Races the configurations on the board for up to time_left seconds.
+            Returns: 0 when the race finished (check hassolution), -1 if it ran out of time.
+            Raises RuntimeError if every racer still running died without reporting
+        """
+        if time_left <= 0:
+            return -1
+
+        if self.hassolution:
+            return 0
+
+        deadline = time.time() + time_left
+        results = multiprocessing.Queue()
+        racers = []
+        for name in self.getRacers():
+            racer = multiprocessing.Process(
+                target=race, args=(name, self.configurations[name], self.gameboard, time_left, results)
+            )
+            racer.daemon = True
+            racer.start()
+            racers.append(racer)
+
+        status = -1
+        try:
+            remaining = len(racers)
+            while remaining > 0:
+                time_left = deadline - time.time()
+                if time_left <= 0:
+                    break
+
+                try:
+                    name, solution, pushes, backtracks, seconds = \
+                        results.get(timeout=min(self.POLL_INTERVAL, time_left))
+                except queue.Empty:
+                    # racers only exit after reporting, so none being left means the others crashed
+                    if results.empty() and not any(racer.is_alive() for racer in racers):
+                        raise RuntimeError("Every racer died before the race finished")
+                    continue
+
+                remaining -= 1
+                if solution is not None:
+                    self.recordWinner(name, solution, pushes, backtracks, seconds)
+                    break
+
+            if remaining == 0 or self.hassolution:
+                status = 0
+        finally:
+            for racer in racers:
+                if racer.is_alive():
+                    racer.terminate()
+            for racer in racers:
+                racer.join()
+            results.close()
+
+        return status
+
+    def recordWinner(self, name, solution, pushes, backtracks, seconds):
+        self.hassolution = True
+        self.solution = solution
+        self.winner = name
+        self.winnerTime = seconds
+
+        # report the winner's trail statistics through the caller's trail
+        if self.trail is not None:
+            self.trail.numPush = pushes
+            self.trail.numUndo = backtracks
+
+        self.stats.recordWin(PortfolioStats.shapeOf(self.gameboard), name)
+        self.stats.save()
+
+    # Returns the solution, or a copy of the board's givens when none was found
+    def getSolution(self):
+        board = self.solution if self.hassolution else [list(row) for row in self.gameboard.board]
+        return SudokuBoard.SudokuBoard(self.gameboard.p, self.gameboard.q, board=board)
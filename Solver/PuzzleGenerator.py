@@ -0,0 +1,142 @@
+import argparse
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from Sudoku_Board import SudokuBoard, BoardLines, BoardCorpus
+from Solver import DLXSolver, SolveLimits
+
+"""
+    Generator of puzzles with a unique solution and a chosen number of clues,
+    for any p x q shape.
+
+    A random full grid is filled by the exact cover solver trying each cell's
+    values in random order, then clues are removed in random order, each
+    removal kept only if a solution count capped at 2 still finds a single
+    solution. A grid whose removals stop above the requested number of clues
+    is replaced by a new one, up to MAX_ATTEMPTS grids.
+
+    Puzzle i of a run is generated from its own random.Random seeded with the
+    run's seed and i, so a run gives the same puzzles whatever the number of
+    worker processes generating them.
+"""
+
+# nodes a random fill may take, per cell, before it is restarted with another shuffle
+FILL_NODES_PER_CELL = 50
+# nodes a uniqueness check may take, per cell, before the clue is kept as if its removal lost uniqueness
+COUNT_NODES_PER_CELL = 200
+# grids tried for one puzzle before giving up on its number of clues
+MAX_ATTEMPTS = 20
+
+
+# Returns the random.Random generating puzzle index of the run seeded with seed
+def makeRandom(seed, index):
+    return random.Random(str(seed) + ":" + str(index))
+
+
+def generateGrid(p, q, rng):
+    """
+        Returns: a random full p x q grid
+    """
+    n = p * q
+    limits = SolveLimits.SolveLimits(max_nodes=FILL_NODES_PER_CELL * n * n)
+    while True:
+        empty = SudokuBoard.SudokuBoard(p, q, board=[[0] * n for _ in range(n)])
+        solver = DLXSolver.DLXSolver(empty, rng=rng)
+        solver.solveWithLimits(limits)
+        if solver.hassolution:
+            return solver.getSolution()
+
+
+# Returns True if board has a single solution, False if it has several or none or the count ran out of nodes
+def hasUniqueSolution(board):
+    limits = SolveLimits.SolveLimits(max_nodes=COUNT_NODES_PER_CELL * board.N * board.N)
+    count, _, result = DLXSolver.DLXSolver(board).countSolutions(2, limits)
+    return count == 1 and result.reason == SolveLimits.EXHAUSTED
+
+
+def generatePuzzle(p, q, clues, rng, attempts=MAX_ATTEMPTS):
+    """
+        Returns: a p x q puzzle with exactly clues givens and a single solution
+        Raises ValueError if no grid of attempts could be cut down to clues givens, as happens when clues is
+            too few for the shape
+    """
+    n = p * q
+    if not 0 <= clues <= n * n:
+        raise ValueError("A " + str(p) + "x" + str(q) + " puzzle has 0 to " + str(n * n) + " clues")
+
+    for _ in range(attempts):
+        grid = generateGrid(p, q, rng).board
+        puzzle = [list(row) for row in grid]
+        givens = n * n
+
+        cells = list(range(n * n))
+        rng.shuffle(cells)
+        for cell in cells:
+            if givens == clues:
+                break
+            row, col = divmod(cell, n)
+            puzzle[row][col] = 0
+            if hasUniqueSolution(SudokuBoard.SudokuBoard(p, q, board=puzzle)):
+                givens -= 1
+            else:
+                puzzle[row][col] = grid[row][col]
+
+        if givens == clues:
+            return SudokuBoard.SudokuBoard(p, q, board=puzzle)
+
+    raise ValueError("No unique " + str(p) + "x" + str(q) + " puzzle with " + str(clues) + " clues found in "
+                     + str(attempts) + " grids")
+
+
+# Returns puzzle index of the run seeded with seed, safe to run in a worker process
+def generatePuzzleAt(p, q, clues, seed, index):
+    return generatePuzzle(p, q, clues, makeRandom(seed, index))
+
+
+def generatePuzzles(p, q, clues, count, seed=0, workers=1):
+    """
+        Yields count unique p x q puzzles with clues givens, in order, generated by workers processes
+    """
+    if workers <= 1:
+        for index in range(count):
+            yield generatePuzzleAt(p, q, clues, seed, index)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(generatePuzzleAt, [p] * count, [q] * count, [clues] * count, [seed] * count,
+                                range(count), chunksize=max(1, count // (4 * workers)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate sudoku puzzles with a unique solution.")
+    parser.add_argument("p", type=int, help="rows per block")
+    parser.add_argument("q", type=int, help="columns per block")
+    parser.add_argument("clues", type=int, help="number of givens of each puzzle")
+    parser.add_argument("count", type=int, help="number of puzzles")
+    parser.add_argument("--seed", default="0", help="seed of the run, the same seed gives the same puzzles")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes generating puzzles")
+    parser.add_argument("--output", default=None,
+                        help="file the puzzles are written to, one per line (default: standard output)")
+    parser.add_argument("--corpus", action="store_true",
+                        help="write --output as a binary board corpus (see Sudoku_Board/BoardCorpus.py)")
+    args = parser.parse_args()
+
+    puzzles = generatePuzzles(args.p, args.q, args.clues, args.count, args.seed, args.workers)
+    try:
+        if args.corpus:
+            if args.output is None:
+                parser.error("--corpus needs --output")
+            with BoardCorpus.CorpusWriter(args.output, args.p, args.q) as corpus:
+                for puzzle in puzzles:
+                    corpus.write(puzzle)
+        else:
+            output = open(args.output, "w") if args.output is not None else sys.stdout
+            writer = BoardLines.BoardWriter(output)
+            for puzzle in puzzles:
+                writer.write(puzzle)
+            if output is not sys.stdout:
+                output.close()
+    except ValueError as e:
+        print("[ERROR] " + str(e), file=sys.stderr)
+        exit(1)
@@ -0,0 +1,191 @@
+import collections
+import dbm
+import time
+
+from Sudoku_Board import BoardLines, BoardSymmetry
+from Solver import BTSolver
+
+"""
+    Cache of solutions keyed by the canonical form of their puzzles, so a
+    puzzle that only differs from a solved one by relabeled values, permuted
+    lines, bands or stacks or a transposition is answered without a search.
+
+    Solutions are stored in canonical form and mapped back through the
+    Transform of the puzzle being looked up. The in-memory tier keeps the
+    maxSize most recently used solutions. The optional disk tier, a dbm file,
+    keeps every solution stored and refills the memory tier on a memory miss.
+    It is not safe to share one disk tier between processes writing to it.
+"""
+
+
+class SolutionCache:
+
+    __slots__ = ("maxSize", "path", "memory", "disk", "hits", "diskHits", "misses", "stores", "evictions")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, maxSize=10000, path=None):
+        """
+            @param maxSize number of solutions kept in memory
+            @param path dbm file of the disk tier, created if missing, no disk tier if None
+        """
+        self.maxSize = maxSize
+        self.path = path
+        self.memory = collections.OrderedDict()  # canonical puzzle line -> canonical solution line, oldest use first
+        self.disk = dbm.open(path, "c") if path is not None else None
+
+        self.hits = 0  # lookups answered from memory
+        self.diskHits = 0  # lookups answered from the disk tier
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0  # solutions dropped from memory to make room
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def __len__(self):
+        return len(self.memory)
+
+    # Returns the hit, miss, store and eviction counters and the share of lookups that hit either tier
+    def getStats(self):
+        lookups = self.hits + self.diskHits + self.misses
+        return {
+            "hits": self.hits,
+            "diskHits": self.diskHits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hitRate": (self.hits + self.diskHits) / lookups if lookups > 0 else 0.0,
+        }
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Returns the canonical solution line stored for the canonical puzzle line key, or None
+    def get(self, key):
+        solution = self.memory.get(key)
+        if solution is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return solution
+
+        if self.disk is not None:
+            solution = self.disk.get(key)
+            if solution is not None:
+                solution = solution.decode()
+                self.remember(key, solution)
+                self.diskHits += 1
+                return solution
+
+        self.misses += 1
+        return None
+
+    def put(self, key, solution):
+        self.remember(key, solution)
+        if self.disk is not None:
+            self.disk[key] = solution
+        self.stores += 1
+
+    # Keeps solution in memory as the most recently used, evicting the least recently used beyond maxSize
+    def remember(self, key, solution):
+        self.memory[key] = solution
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxSize:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    # Returns the solution of board from the cache, or None if no equivalent puzzle is stored
+    def lookup(self, board):
+        key, transform = BoardSymmetry.canonicalize(board)
+        solution = self.get(key)
+        return transform.fromCanonical(BoardLines.parseLine(solution)) if solution is not None else None
+
+    def store(self, board, solution):
+        key, transform = BoardSymmetry.canonicalize(board)
+        self.put(key, BoardLines.formatLine(transform.toCanonical(solution)))
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def makeTournamentSolver(gb, trail):
+    return BTSolver.BTSolver(gb, trail, "tournVal", "tournVar", "tournCC")
+
+
+class CachedSolver:
+
+    __slots__ = ("gameboard", "trail", "cache", "makeSolver", "hassolution", "solution", "cached")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, gb, trail, cache, makeSolver=makeTournamentSolver):
+        """
+            @param cache SolutionCache looked up before solving and updated with new solutions
+            @param makeSolver function of the board and trail returning the solver used on a cache miss
+        """
+        self.gameboard = gb
+        self.trail = trail
+        self.cache = cache
+        self.makeSolver = makeSolver
+
+        self.hassolution = False
+        self.solution = None
+        self.cached = False  # the solution came from the cache
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    # The solver built on a cache miss checks its own consistency
+    def checkConsistency(self, **kwargs):
+        return True
+
+    def solve(self, time_left=600):
+        """
+            Answers from the cache, or solves the board for up to time_left seconds and caches the solution. The
+            time taken to canonicalize the board counts against time_left.
+            Returns: 0 when done (check hassolution), -1 if the solver ran out of time.
+        """
+        if self.hassolution:
+            return 0
+        if time_left <= 0:
+            return -1
+
+        start = time.time()
+        key, transform = BoardSymmetry.canonicalize(self.gameboard)
+        solution = self.cache.get(key)
+        if solution is not None:
+            self.solution = transform.fromCanonical(BoardLines.parseLine(solution))
+            self.hassolution = True
+            self.cached = True
+            return 0
+
+        time_left -= time.time() - start
+        if time_left <= 0:
+            return -1
+
+        solver = self.makeSolver(self.gameboard, self.trail)
+        solver.checkConsistency()
+        status = solver.solve(time_left=time_left)
+        if solver.hassolution:
+            self.solution = solver.getSolution()
+            self.hassolution = True
+            self.cache.put(key, BoardLines.formatLine(transform.toCanonical(self.solution)))
+        return status
+
+    def getSolution(self):
+        return self.solution
@@ -0,0 +1,184 @@
+import threading
+import time
+
+"""
+    Limits on a single solve and the report of how it ended.
+
+    SolveLimits combines an optional wall-clock limit (relative seconds or an
+    absolute time.time() deadline), node and backtrack budgets and a
+    CancelToken. A solver calls start() once and then LimitsMonitor.countNode()
+    for every value it tries. The limits are only evaluated every
+    checkInterval nodes, and on the node that exhausts the node budget, so the
+    clock and the token cost nothing on most nodes. Backtracks are read from
+    the solver's trail at those checks, so a backtrack budget may be overrun
+    by the backtracks made since the last check.
+"""
+
+# Reasons a solve stopped, reported by SolveResult.reason
+SOLVED = "solved"
+EXHAUSTED = "exhausted"  # the whole search space was explored without a solution
+TIMEOUT = "timeout"
+NODE_LIMIT = "node limit"
+BACKTRACK_LIMIT = "backtrack limit"
+CANCELLED = "cancelled"
+
+
+class CancelToken:
+
+    __slots__ = ("event",)
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def isCancelled(self):
+        return self.event.is_set()
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Asks every solve using this token to stop, safe to call from any thread
+    def cancel(self):
+        self.event.set()
+
+
+class SolveLimits:
+
+    __slots__ = ("timeLimit", "deadline", "maxNodes", "maxBacktracks", "cancelToken", "checkInterval")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, time_limit=None, deadline=None, max_nodes=None, max_backtracks=None, cancel_token=None,
+                 check_interval=64):
+        """
+            @param time_limit seconds the solve may take from its start
+            @param deadline time.time() value the solve must stop at, the earlier of both is used
+            @param max_nodes number of values the solver may try
+            @param max_backtracks number of trail undos the solver may make
+            @param cancel_token CancelToken checked along with the other limits
+            @param check_interval number of nodes between two checks of the limits
+        """
+        self.timeLimit = time_limit
+        self.deadline = deadline
+        self.maxNodes = max_nodes
+        self.maxBacktracks = max_backtracks
+        self.cancelToken = cancel_token
+        self.checkInterval = check_interval
+
+    # Returns a monitor of these limits for a solve starting now and counting backtracks on trail
+    def start(self, trail=None):
+        deadline = self.deadline
+        if self.timeLimit is not None:
+            relative = time.time() + self.timeLimit
+            deadline = relative if deadline is None else min(deadline, relative)
+        return LimitsMonitor(self, deadline, trail)
+
+
+class LimitsMonitor:
+
+    __slots__ = ("limits", "deadline", "trail", "startTime", "startPushes", "startUndos", "nodes", "nodesUntilCheck")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, limits, deadline, trail):
+        self.limits = limits
+        self.deadline = deadline
+        self.trail = trail
+        self.startTime = time.time()
+        self.startPushes = trail.getPushCount() if trail is not None else 0
+        self.startUndos = trail.getUndoCount() if trail is not None else 0
+        self.nodes = 0
+        self.nodesUntilCheck = 0
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def getBacktracks(self):
+        return self.trail.getUndoCount() - self.startUndos if self.trail is not None else 0
+
+    def getPushes(self):
+        return self.trail.getPushCount() - self.startPushes if self.trail is not None else 0
+
+    # Returns the reason to stop now, or None to keep searching
+    def check(self):
+        limits = self.limits
+        self.nodesUntilCheck = limits.checkInterval
+        if limits.maxNodes is not None:
+            if self.nodes >= limits.maxNodes:
+                return NODE_LIMIT
+            self.nodesUntilCheck = min(self.nodesUntilCheck, limits.maxNodes - self.nodes)
+
+        if limits.cancelToken is not None and limits.cancelToken.isCancelled():
+            return CANCELLED
+        if limits.maxBacktracks is not None and self.getBacktracks() >= limits.maxBacktracks:
+            return BACKTRACK_LIMIT
+        if self.deadline is not None and time.time() >= self.deadline:
+            return TIMEOUT
+        return None
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Counts a node about to be tried
+    # Returns: the reason to stop before trying it, or None
+    def countNode(self):
+        self.nodesUntilCheck -= 1
+        if self.nodesUntilCheck > 0:
+            self.nodes += 1
+            return None
+
+        reason = self.check()
+        if reason is None:
+            self.nodes += 1
+        return reason
+
+    # Returns the SolveResult of the solve, stopped for reason or finished when reason is None
+    def finish(self, reason, hassolution):
+        if reason is None:
+            reason = SOLVED if hassolution else EXHAUSTED
+        return SolveResult(reason, self.nodes, self.getBacktracks(), self.getPushes(), time.time() - self.startTime)
+
+
+class SolveResult:
+
+    __slots__ = ("reason", "nodes", "backtracks", "pushes", "seconds")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self, reason, nodes, backtracks, pushes, seconds):
+        self.reason = reason  # one of SOLVED, EXHAUSTED, TIMEOUT, NODE_LIMIT, BACKTRACK_LIMIT or CANCELLED
+        self.nodes = nodes  # values tried
+        self.backtracks = backtracks
+        self.pushes = pushes
+        self.seconds = seconds
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def isSolved(self):
+        return self.reason == SOLVED
+
+    # Returns true if the search was cut short by a limit or a cancellation before finishing
+    def isStopped(self):
+        return self.reason != SOLVED and self.reason != EXHAUSTED
+
+    def __str__(self):
+        return (self.reason + " after " + str(self.nodes) + " nodes, " + str(self.backtracks) + " backtracks, "
+                + str(self.pushes) + " trail pushes in " + "{:.3f}".format(self.seconds) + " seconds")
@@ -0,0 +1,533 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+from Sudoku_Board import SudokuBoard, BoardLines, NetworkTemplate, Trail
+from Solver import BTSolver, DLXSolver, SolveLimits
+
+"""
+    Local HTTP solve service, built on asyncio streams so it needs nothing
+    beyond the standard library.
+
+    POST /solve takes either a JSON object, {"board": [[...], ...]} with
+    optional "p" and "q" or {"line": "..."} in the one board per line format,
+    or a text body of one or more board lines (see Sudoku_Board/BoardLines.py).
+    A JSON request may set "timeout" in seconds and "solver" ("tournament" or
+    "dlx"), a text request the same as query parameters. A JSON request is
+    answered with one result, a text request with {"results": [...]} in line
+    order. Each result holds the stop reason of the search ("solved",
+    "exhausted", "timeout", ...), the solution line or null and the stats of
+    its solve. GET /metrics returns the queue depth, batch and latency
+    metrics, GET /health answers once the workers are warm.
+
+    Boards of all requests wait in one queue. Each time a worker is free, the
+    dispatcher takes every board queued, up to batchSize, waiting batchWait
+    seconds for more when the queue is short, and sends them to the pool of
+    worker processes as one batch. The workers are started, and the network
+    templates of the common shapes built in them, before the server accepts
+    connections. A board's timeout runs from its arrival, so time spent in
+    the queue counts against it. A request is only queued if all of its
+    boards fit, and a pool broken by a dying worker is replaced by a fresh
+    one, failing only the batches that were running on it.
+"""
+
+# seconds a board may take when its request gives no timeout, and the most it may ask for
+DEFAULT_TIMEOUT = 10.0
+MAX_TIMEOUT = 60.0
+# boards waiting for a worker beyond which requests are turned away with 503
+MAX_QUEUE = 10000
+# largest request body accepted
+MAX_BODY = 1 << 20
+# number of most recent requests the latency percentiles are computed over
+LATENCY_WINDOW = 10000
+# shapes whose network templates are built in each worker before it takes requests
+WARM_SHAPES = ((3, 3), (3, 4), (4, 4))
+
+SOLVER_NAMES = ("tournament", "dlx")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Returns the value at fraction (0 to 1) of the sorted list values, 0.0 if it is empty
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Returns the mean, p50, p90, p99 and max of values
+def summarize(values):
+    values = sorted(values)
+    return {
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+# ==================================================================
+# Worker Functions
+# ==================================================================
+
+def warmWorker(shapes):
+    for p, q in shapes:
+        NetworkTemplate.getTemplate(p, q)
+
+
+# Returns the pid of the worker, used to start every worker before the server accepts requests
+def pingWorker():
+    return os.getpid()
+
+
+def solveBoard(board, solver, deadline):
+    """
+        Solves board with the solver named solver until it is solved, shown to have no solution or deadline
+        (a time.time() value) is reached
+        Returns: a dict with the stop reason, the solution line (None if not found) and the node, backtrack and
+            trail push counts and seconds of the solve
+    """
+    trail = Trail.Trail()
+    if solver == "dlx":
+        solver = DLXSolver.DLXSolver(board, trail)
+    else:
+        solver = BTSolver.BTSolver(board, trail, "tournVal", "tournVar", "tournCC")
+
+    start = time.time()
+    solver.checkConsistency()
+    result = solver.solveWithLimits(SolveLimits.SolveLimits(deadline=deadline))
+    return {
+        "status": result.reason,
+        "solution": BoardLines.formatLine(solver.getSolution()) if solver.hassolution else None,
+        "nodes": result.nodes,
+        "backtracks": result.backtracks,
+        "pushes": result.pushes,
+        "solveSeconds": time.time() - start,
+    }
+
+
+# Solves each (board, solver, deadline) of batch in turn, safe to run in a worker process
+def solveBatch(batch):
+    return [solveBoard(board, solver, deadline) for board, solver, deadline in batch]
+
+
+# ==================================================================
+# Requests
+# ==================================================================
+
+def boardFromJSON(request):
+    """
+        Returns: the SudokuBoard of a JSON request, given as "line" or as "board" rows with optional "p" and "q"
+        Raises ValueError if the request holds no valid board
+    """
+    if not isinstance(request, dict):
+        raise ValueError("A JSON request is an object")
+    if "line" in request:
+        if not isinstance(request["line"], str):
+            raise ValueError("\"line\" is a string")
+        board = BoardLines.parseLine(request["line"])
+        if board is None:
+            raise ValueError("\"line\" holds no board")
+        return board
+
+    rows = request.get("board")
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("A JSON request needs a \"board\" or a \"line\"")
+    n = len(rows)
+    p, q = request.get("p"), request.get("q")
+    if p is None and q is None:
+        p, q = BoardLines.defaultShape(n)
+    if not isinstance(p, int) or not isinstance(q, int) or p * q != n:
+        raise ValueError("A board of " + str(n) + " rows needs p * q == " + str(n))
+    for row in rows:
+        if not isinstance(row, list) or len(row) != n:
+            raise ValueError("Each row of the board needs " + str(n) + " values")
+        for value in row:
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= n:
+                raise ValueError("Bad value " + repr(value) + " for a board of " + str(n) + " values")
+    return SudokuBoard.SudokuBoard(p, q, board=[list(row) for row in rows])
+
+
+def boardsFromText(text):
+    """
+        Returns: the SudokuBoard of each board line of text, in order
+        Raises ValueError naming the first line that is not a board, or if text holds no board
+    """
+    boards = []
+    for number, line in enumerate(text.splitlines(), 1):
+        try:
+            board = BoardLines.parseLine(line)
+        except ValueError as e:
+            raise ValueError("Line " + str(number) + ": " + str(e))
+        if board is not None:
+            boards.append(board)
+    if not boards:
+        raise ValueError("The request holds no board")
+    return boards
+
+
+# Returns the timeout, in seconds, asked for by value, DEFAULT_TIMEOUT if value is None
+def parseTimeout(value):
+    if value is None:
+        return DEFAULT_TIMEOUT
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("Bad timeout: " + repr(value))
+    if not timeout > 0:
+        raise ValueError("The timeout must be positive")
+    return min(timeout, MAX_TIMEOUT)
+
+
+def parseSolver(value):
+    if value is None:
+        return "tournament"
+    if value not in SOLVER_NAMES:
+        raise ValueError("Unknown solver " + repr(value) + ", one of " + ", ".join(SOLVER_NAMES))
+    return value
+
+
+class PendingBoard:
+
+    __slots__ = ("board", "solver", "deadline", "arrival", "future")
+
+    def __init__(self, board, solver, timeout, future):
+        self.board = board
+        self.solver = solver
+        self.deadline = time.time() + timeout
+        self.arrival = time.perf_counter()
+        self.future = future  # set to the board's result dict by the dispatcher
+
+
+# ==================================================================
+# Metrics
+# ==================================================================
+
+class ServerMetrics:
+
+    __slots__ = ("startTime", "requests", "boards", "completed", "rejected", "badRequests", "errors", "statuses",
+                 "maxQueueDepth", "inFlight", "batches", "batchedBoards", "poolRestarts", "latencies", "queueWaits")
+
+    def __init__(self):
+        self.startTime = time.time()
+        self.requests = 0  # HTTP requests to /solve
+        self.boards = 0  # boards queued
+        self.completed = 0  # boards answered with a result
+        self.rejected = 0  # boards turned away with a full queue
+        self.badRequests = 0
+        self.errors = 0  # boards lost to a failed worker
+        self.statuses = collections.Counter()  # stop reason -> boards
+        self.maxQueueDepth = 0
+        self.inFlight = 0  # boards of the batches being solved
+        self.batches = 0
+        self.batchedBoards = 0
+        self.poolRestarts = 0  # worker pools replaced after a worker died
+        # seconds from arrival to result, and from arrival to being sent to a worker, of the latest boards
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.queueWaits = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def toDict(self, queueDepth):
+        return {
+            "uptime": time.time() - self.startTime,
+            "requests": self.requests,
+            "boards": self.boards,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "badRequests": self.badRequests,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "queueDepth": queueDepth,
+            "maxQueueDepth": self.maxQueueDepth,
+            "inFlight": self.inFlight,
+            "batches": self.batches,
+            "meanBatchSize": self.batchedBoards / self.batches if self.batches > 0 else 0.0,
+            "poolRestarts": self.poolRestarts,
+            "latency": summarize(self.latencies),
+            "queueWait": summarize(self.queueWaits),
+        }
+
+
+# ==================================================================
+# Server
+# ==================================================================
+
+class SolveServer:
+
+    __slots__ = ("workers", "batchSize", "batchWait", "maxQueue", "pool", "queue", "freeWorkers", "metrics",
+                 "dispatcher")
+
+    def __init__(self, workers=None, batchSize=8, batchWait=0.002, maxQueue=MAX_QUEUE):
+        """
+            @param workers number of worker processes, the number of CPU cores if None
+            @param batchSize most boards sent to a worker at once
+            @param batchWait seconds a batch shorter than batchSize waits for more boards before it is sent
+            @param maxQueue boards that may wait for a worker before requests are turned away
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batchSize = batchSize
+        self.batchWait = batchWait
+        self.maxQueue = maxQueue
+        self.pool = None
+        self.queue = None
+        self.freeWorkers = None
+        self.metrics = ServerMetrics()
+        self.dispatcher = None
+
+    # Starts and warms the worker processes, and the dispatcher sending them batches
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.pool = self.makePool()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, pingWorker) for _ in range(self.workers)))
+        self.queue = asyncio.Queue(maxsize=self.maxQueue)
+        self.freeWorkers = asyncio.Semaphore(self.workers)
+        self.dispatcher = asyncio.ensure_future(self.dispatch())
+
+    def makePool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=warmWorker, initargs=(WARM_SHAPES,))
+
+    async def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    # ==================================================================
+    # Batching
+    # ==================================================================
+
+    # Queues boards for the workers, all of them or none, and returns their results in order once solved
+    async def solve(self, boards, solver, timeout):
+        if len(boards) > self.maxQueue:
+            raise HttpError(413, "A request holds at most " + str(self.maxQueue) + " boards")
+        if self.queue.qsize() + len(boards) > self.maxQueue:
+            self.metrics.rejected += len(boards)
+            raise HttpError(503, "Too many boards waiting, try again later")
+
+        # nothing else runs between the check and the puts, so every board fits
+        loop = asyncio.get_running_loop()
+        futures = []
+        for board in boards:
+            future = loop.create_future()
+            self.queue.put_nowait(PendingBoard(board, solver, timeout, future))
+            futures.append(future)
+        self.metrics.boards += len(boards)
+        self.metrics.maxQueueDepth = max(self.metrics.maxQueueDepth, self.queue.qsize())
+        return await asyncio.gather(*futures)
+
+    async def dispatch(self):
+        while True:
+            await self.freeWorkers.acquire()
+            batch = [await self.queue.get()]
+            if self.batchWait > 0 and self.queue.qsize() < self.batchSize - 1:
+                await asyncio.sleep(self.batchWait)
+            while len(batch) < self.batchSize and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            asyncio.ensure_future(self.runBatch(batch))
+
+    async def runBatch(self, batch):
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.batchedBoards += len(batch)
+        metrics.inFlight += len(batch)
+        sent = time.perf_counter()
+        for pending in batch:
+            metrics.queueWaits.append(sent - pending.arrival)
+
+        pool = self.pool
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                pool, solveBatch, [(pending.board, pending.solver, pending.deadline) for pending in batch])
+        except Exception as e:
+            # every batch running on a broken pool fails, the first to notice replaces it
+            if isinstance(e, BrokenProcessPool) and self.pool is pool:
+                self.pool = self.makePool()
+                pool.shutdown(wait=False)
+                metrics.poolRestarts += 1
+            metrics.errors += len(batch)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(HttpError(500, "Worker failed: " + repr(e)))
+            return
+        finally:
+            metrics.inFlight -= len(batch)
+            self.freeWorkers.release()
+
+        done = time.perf_counter()
+        for pending, result in zip(batch, results):
+            result["queueSeconds"] = sent - pending.arrival
+            result["totalSeconds"] = done - pending.arrival
+            result["batchSize"] = len(batch)
+            metrics.latencies.append(result["totalSeconds"])
+            metrics.statuses[result["status"]] += 1
+            metrics.completed += 1
+            if not pending.future.done():  # the client may have gone away
+                pending.future.set_result(result)
+
+    # ==================================================================
+    # HTTP
+    # ==================================================================
+
+    async def handleConnection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await readRequest(reader)
+                except HttpError as e:
+                    # the rest of a request that could not be read is not skipped, so the connection is closed
+                    writeResponse(writer, e.status, {"error": str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                keepAlive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = await self.route(method, target, headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                writeResponse(writer, status, payload, keepAlive)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Returns the status and JSON payload answering the request
+    async def route(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == "/metrics" or url.path == "/health":
+            if method != "GET":
+                raise HttpError(405, url.path + " takes GET")
+            if url.path == "/health":
+                return 200, {"status": "ok", "workers": self.workers}
+            return 200, self.metrics.toDict(self.queue.qsize())
+        if url.path != "/solve":
+            raise HttpError(404, "No such path: " + url.path)
+        if method != "POST":
+            raise HttpError(405, "/solve takes POST")
+
+        self.metrics.requests += 1
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            text = body.decode("utf-8")
+            if headers.get("content-type", "").split(";")[0].strip() == "application/json":
+                request = json.loads(text)
+                boards = [boardFromJSON(request)]
+                solver = parseSolver(request.get("solver"))
+                timeout = parseTimeout(request.get("timeout"))
+                return 200, (await self.solve(boards, solver, timeout))[0]
+            boards = boardsFromText(text)
+            solver = parseSolver(query.get("solver"))
+            timeout = parseTimeout(query.get("timeout"))
+        except ValueError as e:  # including bad UTF-8 and JSON
+            self.metrics.badRequests += 1
+            raise HttpError(400, str(e))
+        return 200, {"results": await self.solve(boards, solver, timeout)}
+
+
+async def readRequest(reader):
+    """
+        Returns: the method, target, headers (lower case names) and body of the next request on reader, or None
+            once the client closed the connection
+        Raises HttpError if the request is malformed or its body too large
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Bad request line")
+
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Bodies are limited to " + str(MAX_BODY) + " bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target, headers, body
+
+
+def writeResponse(writer, status, payload, keepAlive):
+    body = json.dumps(payload).encode()
+    writer.write(("HTTP/1.1 " + str(status) + " " + REASONS.get(status, "") + "\r\n"
+                  + "Content-Type: application/json\r\n"
+                  + "Content-Length: " + str(len(body)) + "\r\n"
+                  + "Connection: " + ("keep-alive" if keepAlive else "close") + "\r\n\r\n").encode() + body)
+
+
+# Serves server on host and port until SIGINT or SIGTERM
+async def serve(host, port, server):
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopped.set)
+        except (NotImplementedError, RuntimeError):  # no signal handlers on this platform, Ctrl-C still stops it
+            pass
+
+    await server.start()
+    try:
+        listener = await asyncio.start_server(server.handleConnection, host, port)
+        print("Solving on http://" + host + ":" + str(port) + " with " + str(server.workers) + " workers",
+              file=sys.stderr)
+        async with listener:
+            await stopped.wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve sudoku solves over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPU cores)")
+    parser.add_argument("--batch-size", type=int, default=8, help="most boards sent to a worker at once (default: 8)")
+    parser.add_argument("--batch-wait", type=float, default=0.002,
+                        help="seconds a short batch waits for more boards before it is sent (default: 0.002)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE,
+                        help="boards that may wait for a worker before requests get 503 (default: "
+                             + str(MAX_QUEUE) + ")")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    try:
+        asyncio.run(serve(args.host, args.port, SolveServer(args.workers, args.batch_size, args.batch_wait,
+                                                            args.max_queue)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+import json
+import time
+
+"""
+    Opt-in profile of a BTSolver search: cumulative time and call count of
+    each phase of the search, the domain values removed and the variables
+    assigned by propagation, the deepest decision level reached and the node
+    rate.
+
+    The solver binds its phase functions once per search, wrapped by
+    timed/timedPropagation only when profiling is enabled, so a solver that
+    is not profiled pays nothing for it. The removals and assignments are
+    counted from network totals read around each propagation, outside the
+    timed call, so they do not inflate the propagation time. The network
+    keeps those totals up to date as domains change, so reading them is
+    constant time whatever the board size.
+"""
+
+# phases of the search, each timed separately
+SELECT = "select"  # selectNextVariable
+VALUES = "values"  # getNextValues
+PROPAGATE = "propagate"  # checkConsistency
+UNDO = "undo"  # Trail.undo
+PHASES = (SELECT, VALUES, PROPAGATE, UNDO)
+
+
+class SolverStats:
+
+    __slots__ = ("times", "calls", "removals", "assignments", "maxDepth", "nodes", "backtracks", "pushes", "seconds",
+                 "searches")
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)  # phase -> cumulative seconds
+        self.calls = dict.fromkeys(PHASES, 0)  # phase -> number of calls
+        self.removals = 0  # domain values removed by propagation
+        self.assignments = 0  # variables assigned by propagation
+        self.maxDepth = 0  # most decisions on the trail at once
+        self.nodes = 0
+        self.backtracks = 0
+        self.pushes = 0
+        self.seconds = 0.0
+        self.searches = 0  # searches recorded, more than one once stats are merged
+
+    @staticmethod
+    def fromDict(stats):
+        result = SolverStats()
+        result.times = dict(stats["times"])
+        result.calls = dict(stats["calls"])
+        for name in ("removals", "assignments", "maxDepth", "nodes", "backtracks", "pushes", "seconds", "searches"):
+            setattr(result, name, stats[name])
+        return result
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def getNodesPerSecond(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def toDict(self):
+        return {
+            "times": dict(self.times),
+            "calls": dict(self.calls),
+            "removals": self.removals,
+            "assignments": self.assignments,
+            "maxDepth": self.maxDepth,
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "pushes": self.pushes,
+            "seconds": self.seconds,
+            "nodesPerSecond": self.getNodesPerSecond(),
+            "searches": self.searches,
+        }
+
+    def toJSON(self):
+        return json.dumps(self.toDict(), indent=2)
+
+    def __str__(self):
+        lines = ["{:<10}{:>12}{:>12}{:>8}".format("phase", "calls", "seconds", "share")]
+        for phase in PHASES:
+            share = self.times[phase] / self.seconds if self.seconds > 0 else 0.0
+            lines.append("{:<10}{:>12}{:>12.4f}{:>8.1%}".format(phase, self.calls[phase], self.times[phase], share))
+        lines.append("propagation: " + str(self.removals) + " values removed, " + str(self.assignments)
+                     + " variables assigned")
+        lines.append("search: " + str(self.nodes) + " nodes, " + str(self.backtracks) + " backtracks, "
+                     + str(self.pushes) + " trail pushes, max depth " + str(self.maxDepth) + ", "
+                     + "{:.0f}".format(self.getNodesPerSecond()) + " nodes per second over "
+                     + "{:.3f}".format(self.seconds) + " seconds")
+        return "\n".join(lines)
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Returns function wrapped to add its time and call to phase
+    def timed(self, phase, function):
+        times = self.times
+        calls = self.calls
+        clock = time.perf_counter
+
+        def call(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[phase] += clock() - start
+                calls[phase] += 1
+
+        return call
+
+    # Returns the consistency check function wrapped like timed, also counting its effect on network and the depth
+    # of trail when it is called
+    def timedPropagation(self, function, network, trail):
+        check = self.timed(PROPAGATE, function)
+
+        def call(*args, **kwargs):
+            depth = len(trail.trailMarker)
+            if depth > self.maxDepth:
+                self.maxDepth = depth
+            candidates = network.getCandidateTotal()
+            assigned = network.getAssignedTotal()
+            consistent = check(*args, **kwargs)
+            self.removals += candidates - network.getCandidateTotal()
+            self.assignments += network.getAssignedTotal() - assigned
+            return consistent
+
+        return call
+
+    # Adds the counts of a finished search, from its SolveResult
+    def record(self, result):
+        self.nodes += result.nodes
+        self.backtracks += result.backtracks
+        self.pushes += result.pushes
+        self.seconds += result.seconds
+        self.searches += 1
+
+    # Adds the counts of other to these
+    def merge(self, other):
+        for phase in PHASES:
+            self.times[phase] += other.times[phase]
+            self.calls[phase] += other.calls[phase]
+        self.removals += other.removals
+        self.assignments += other.assignments
+        self.maxDepth = max(self.maxDepth, other.maxDepth)
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.pushes += other.pushes
+        self.seconds += other.seconds
+        self.searches += other.searches
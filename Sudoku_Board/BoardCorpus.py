@@ -0,0 +1,227 @@
+import argparse
+import mmap
+import os
+import struct
+
+from Sudoku_Board import SudokuBoard, BoardLines
+
+"""
+    Binary corpus of same shape boards, read through mmap so any board is
+    available without parsing or even reading the rest of the file.
+
+    The file is a 16 byte header, the magic b"SDKC", the format version, p, q,
+    the bits per cell and the number of boards as a little endian uint64,
+    followed by one fixed width record per board. A record packs the N*N
+    cells row by row, bits per cell each (4 up to 15 x 15 boards, 5 up to
+    31 x 31, 6 beyond), into the bits of a little endian integer padded to a
+    whole number of bytes, so board i starts at HEADER_SIZE + i * recordSize.
+
+    Run as python -m Sudoku_Board.BoardCorpus to convert board files,
+    directories of board files such as Sample_Boards/ and one board per line
+    files into corpora, one per board shape.
+"""
+
+MAGIC = b"SDKC"
+VERSION = 1
+HEADER = struct.Struct( "<4sBBBBQ" )
+HEADER_SIZE = HEADER.size
+
+
+# Returns the number of bits a cell of a board of n values is packed into
+def cellBits ( n ):
+    return max( 4, n.bit_length() )
+
+
+# Returns the number of bytes of the record of a p x q board
+def recordSize ( p, q ):
+    n = p * q
+    return ( n * n * cellBits( n ) + 7 ) // 8
+
+
+class BoardCorpus:
+
+    __slots__ = ( "path", "file", "map", "p", "q", "N", "bits", "count", "recordSize" )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, path ):
+        """
+            Maps the corpus file at path
+            Raises ValueError if the file is not a corpus
+        """
+        self.path = path
+        self.file = open( path, "rb" )
+        try:
+            self.map = mmap.mmap( self.file.fileno(), 0, access = mmap.ACCESS_READ )
+            if len( self.map ) < HEADER_SIZE:
+                raise ValueError( path + " is too short to be a board corpus" )
+            magic, version, self.p, self.q, self.bits, self.count = HEADER.unpack_from( self.map, 0 )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError( path + " is not a version " + str( VERSION ) + " board corpus" )
+            self.N = self.p * self.q
+            self.recordSize = recordSize( self.p, self.q )
+            if len( self.map ) < HEADER_SIZE + self.count * self.recordSize:
+                raise ValueError( path + " is truncated, it should hold " + str( self.count ) + " boards" )
+        except:
+            self.close()
+            raise
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def __len__ ( self ):
+        return self.count
+
+    # Returns the packed record of board i, a view into the mapped file
+    def getRecord ( self, i ):
+        if not 0 <= i < self.count:
+            raise IndexError( "board " + str( i ) + " of a corpus of " + str( self.count ) )
+        start = HEADER_SIZE + i * self.recordSize
+        return memoryview( self.map )[start:start + self.recordSize]
+
+    # Returns the N*N cells of board i row by row, one byte each
+    def getCells ( self, i ):
+        packed = int.from_bytes( self.getRecord( i ), "little" )
+        bits = self.bits
+        mask = ( 1 << bits ) - 1
+        return bytes( packed >> ( k * bits ) & mask for k in range( self.N * self.N ) )
+
+    def getBoard ( self, i ):
+        cells = self.getCells( i )
+        n = self.N
+        board = [ list( cells[row * n:( row + 1 ) * n] ) for row in range( n ) ]
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = board )
+
+    def __getitem__ ( self, i ):
+        return self.getBoard( i )
+
+    def __iter__ ( self ):
+        for i in range( self.count ):
+            yield self.getBoard( i )
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    def close ( self ):
+        if getattr( self, "map", None ) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exc_info ):
+        self.close()
+
+
+class CorpusWriter:
+
+    __slots__ = ( "file", "p", "q", "N", "bits", "count" )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    # Starts a corpus of p x q boards at path, its count is written by close()
+    def __init__ ( self, path, p, q ):
+        self.p = p
+        self.q = q
+        self.N = p * q
+        self.bits = cellBits( self.N )
+        if self.bits > 8:
+            raise ValueError( "A board corpus holds boards of at most 255 values" )
+        self.count = 0
+        self.file = open( path, "wb" )
+        self.file.write( HEADER.pack( MAGIC, VERSION, p, q, self.bits, 0 ) )
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    def write ( self, board ):
+        if board.p != self.p or board.q != self.q:
+            raise ValueError( "A corpus of " + str( self.p ) + "x" + str( self.q ) + " boards cannot hold a "
+                              + str( board.p ) + "x" + str( board.q ) + " board" )
+        packed = 0
+        shift = 0
+        for row in board.board:
+            for value in row:
+                packed |= value << shift
+                shift += self.bits
+        self.file.write( packed.to_bytes( recordSize( self.p, self.q ), "little" ) )
+        self.count += 1
+
+    def close ( self ):
+        self.file.seek( 0 )
+        self.file.write( HEADER.pack( MAGIC, VERSION, self.p, self.q, self.bits, self.count ) )
+        self.file.close()
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exc_info ):
+        self.close()
+
+
+# Yields the boards of the text files and directories of board files in sources
+def readTextBoards ( sources ):
+    for source in sources:
+        if os.path.isdir( source ):
+            yield from readTextBoards( os.path.join( source, name ) for name in sorted( os.listdir( source ) ) )
+            continue
+
+        # a board file starts with its "p q" line, a line file with a board
+        with open( source ) as f:
+            first = f.readline().split( "#", 1 )[0].split()
+        if len( first ) == 2 and all( x.isdigit() for x in first ):
+            yield SudokuBoard.SudokuBoard( filepath = source )
+        else:
+            yield from BoardLines.readBoards( source )
+
+
+# Returns the path of the corpus of p x q boards written by convert for path
+def shapePath ( path, p, q ):
+    stem, extension = os.path.splitext( path )
+    return stem + "." + str( p ) + "x" + str( q ) + extension
+
+
+def convert ( sources, path ):
+    """
+        Writes the boards of the text sources to corpora, path itself if they share one shape and
+        otherwise one shapePath(path, p, q) file per shape, in the order the boards are read
+        Returns: a dict of the path written for each (p, q) shape to the number of boards in it
+    """
+    writers = dict()
+    try:
+        for board in readTextBoards( sources ):
+            writer = writers.get( ( board.p, board.q ) )
+            if writer is None:
+                writer = CorpusWriter( shapePath( path, board.p, board.q ), board.p, board.q )
+                writers[( board.p, board.q )] = writer
+            writer.write( board )
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    written = { shapePath( path, p, q ): writer.count for ( p, q ), writer in writers.items() }
+    if len( writers ) == 1:
+        ( p, q ), = writers
+        os.replace( shapePath( path, p, q ), path )
+        written = { path: written[shapePath( path, p, q )] }
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description = "Convert text boards into binary board corpora." )
+    parser.add_argument( "output", help = "corpus file, suffixed with the board shape when the boards have several" )
+    parser.add_argument( "sources", nargs = "+",
+                         help = "board files, directories of board files and one board per line files" )
+    args = parser.parse_args()
+
+    for path, count in convert( args.sources, args.output ).items():
+        print( "Wrote " + str( count ) + " boards to " + path )
@@ -0,0 +1,120 @@
+from Sudoku_Board import SudokuBoard
+
+"""
+    One puzzle per line text format, for corpora too large for a file per board.
+
+    A line holds the N*N cells of a board row by row, one character per cell:
+    '.' or '0' for a blank and the base 36 odometer digit of the value
+    otherwise (1-9 then A-Z, so boards up to 35 x 35). The line may start with
+    a "pxq:" shape prefix. Without one, the shape is the most square p x q with
+    p <= q, so 81 cells are a 3x3 board and 144 cells a 3x4 board. Anything
+    after a '#' is a comment, and blank lines are skipped.
+
+    readBoards parses a file lazily, one line at a time, and BoardWriter
+    appends one line per board, so a corpus of any size is handled in
+    constant memory.
+"""
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+# Returns the (p, q) shape assumed for boards of n values given no shape prefix
+def defaultShape ( n ):
+    p = int( n ** 0.5 )
+    while n % p != 0:
+        p -= 1
+    return p, n // p
+
+
+def parseLine ( line ):
+    """
+        Returns: the SudokuBoard written on line, or None if the line holds no board
+        Raises ValueError if the line is not a board
+    """
+    line = line.split( "#", 1 )[0].strip()
+    if line == "":
+        return None
+
+    shape = None
+    if ":" in line:
+        prefix, line = line.split( ":", 1 )
+        try:
+            p, q = ( int( x ) for x in prefix.lower().split( "x" ) )
+        except ValueError:
+            raise ValueError( "Bad shape prefix: " + prefix )
+        shape = ( p, q )
+        line = line.strip()
+
+    n = int( round( len( line ) ** 0.5 ) )
+    if n * n != len( line ) or n == 0:
+        raise ValueError( "A board line needs a square number of cells, got " + str( len( line ) ) )
+    p, q = shape if shape is not None else defaultShape( n )
+    if p * q != n:
+        raise ValueError( "A " + str( p ) + "x" + str( q ) + " board has " + str( ( p * q ) ** 2 ) + " cells, got "
+                          + str( len( line ) ) )
+
+    cells = []
+    for c in line:
+        value = 0 if c == "." else ALPHABET.find( c.upper() )
+        if value < 0 or value > n:
+            raise ValueError( "Bad cell " + repr( c ) + " for a board of " + str( n ) + " values" )
+        cells.append( value )
+
+    board = [ cells[row * n:( row + 1 ) * n] for row in range( n ) ]
+    return SudokuBoard.SudokuBoard( p, q, board = board )
+
+
+# Returns the line of board, with a shape prefix only when the shape is not the default one
+def formatLine ( board ):
+    line = "".join( ALPHABET[value] if value != 0 else "." for row in board.board for value in row )
+    if ( board.p, board.q ) != defaultShape( board.N ):
+        line = str( board.p ) + "x" + str( board.q ) + ":" + line
+    return line
+
+
+def readBoards ( source ):
+    """
+        Yields the boards of source, a path or an open text file, in order and one line at a time
+        Raises ValueError naming the line of the first malformed board
+    """
+    if isinstance( source, str ):
+        with open( source ) as f:
+            yield from readBoards( f )
+        return
+
+    for number, line in enumerate( source, 1 ):
+        try:
+            board = parseLine( line )
+        except ValueError as e:
+            raise ValueError( "Line " + str( number ) + ": " + str( e ) )
+        if board is not None:
+            yield board
+
+
+class BoardWriter:
+
+    __slots__ = ( "file", "count" )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, f ):
+        self.file = f  # open text file the lines are written to
+        self.count = 0
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    def write ( self, board ):
+        self.file.write( formatLine( board ) + "\n" )
+        self.count += 1
+
+    # Writes the line of a puzzle without a solution, marked by a comment so readers still see the puzzle
+    def writeUnsolved ( self, puzzle ):
+        self.file.write( formatLine( puzzle ) + " # no solution\n" )
+        self.count += 1
+
+    def flush ( self ):
+        self.file.flush()
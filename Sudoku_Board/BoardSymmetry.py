@@ -0,0 +1,209 @@
+import itertools
+
+from Sudoku_Board import SudokuBoard, BoardLines
+
+"""
+    Canonical form of a board under the sudoku symmetries: relabeling the
+    values, permuting the rows of a band (the p rows of a row of blocks), the
+    bands, the columns of a stack (the q columns of a column of blocks) and
+    the stacks, and transposing boards with square blocks.
+
+    The rows, columns, values, bands and stacks are first colored by
+    iterated refinement on the givens, so every color depends only on the
+    board's structure and not on its orientation or labels. Lines are then
+    ordered by color, the lines that still tie are tried in every order, up
+    to MAX_ORDERINGS row and column order pairs per orientation, and the
+    order whose relabeled cells are lexicographically smallest is the
+    canonical one, with values relabeled in order of first appearance.
+
+    The form is always reached through a symmetry, so equal forms always mean
+    equivalent boards. Boards with so many ties that the orders tried are
+    capped may get different forms for equivalent boards.
+"""
+
+# (row order, column order) pairs tried per orientation
+MAX_ORDERINGS = 512
+
+
+class Transform:
+
+    __slots__ = ( "p", "q", "transposed", "rows", "cols", "labels" )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, p, q, transposed, rows, cols, labels ):
+        self.p = p
+        self.q = q
+        self.transposed = transposed  # the board is transposed before its lines are reordered
+        self.rows = rows  # canonical row r is row rows[r] of the (transposed) board
+        self.cols = cols  # canonical column c is column cols[c] of the (transposed) board
+        self.labels = labels  # board value -> canonical value, 0 for blanks
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Returns board, or a solution of it, in canonical form
+    def toCanonical ( self, board ):
+        grid = transpose( board.board ) if self.transposed else board.board
+        labels = self.labels
+        canonical = [ [ labels[grid[row][col]] for col in self.cols ] for row in self.rows ]
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = canonical )
+
+    # Returns the board whose canonical form is canonical, such as the board's solution from a canonical solution
+    def fromCanonical ( self, canonical ):
+        n = self.p * self.q
+        values = [ 0 ] * ( n + 1 )
+        for value, label in enumerate( self.labels ):
+            values[label] = value
+
+        grid = [ [ 0 ] * n for _ in range( n ) ]
+        for r, row in enumerate( self.rows ):
+            cells = canonical.board[r]
+            gridRow = grid[row]
+            for c, col in enumerate( self.cols ):
+                gridRow[col] = values[cells[c]]
+        if self.transposed:
+            grid = transpose( grid )
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = grid )
+
+
+def transpose ( grid ):
+    return [ list( column ) for column in zip( *grid ) ]
+
+
+def canonicalize ( board ):
+    """
+        Returns: the canonical form of board as a BoardLines line, and the Transform taking board to it
+    """
+    orientations = [ False, True ] if board.p == board.q else [ False ]
+
+    best = None
+    for transposed in orientations:
+        grid = transpose( board.board ) if transposed else board.board
+        cells, transform = minimalOrdering( grid, board.p, board.q, transposed )
+        if best is None or cells < best[0]:
+            best = ( cells, transform )
+
+    cells, transform = best
+    return BoardLines.formatLine( transform.toCanonical( board ) ), transform
+
+
+# Returns the lexicographically smallest relabeled cells over the line orders tried, and their Transform
+def minimalOrdering ( grid, p, q, transposed ):
+    n = p * q
+    rowColors, colColors, bandColors, stackColors = refineColors( grid, p, q )
+
+    # product reads its inputs whole, so both are capped before they are paired
+    rowOrders = list( itertools.islice( lineOrders( q, p, bandColors, rowColors ), MAX_ORDERINGS ) )
+    colOrders = list( itertools.islice( lineOrders( p, q, stackColors, colColors ), MAX_ORDERINGS ) )
+
+    best = None
+    for rows, cols in itertools.islice( itertools.product( rowOrders, colOrders ), MAX_ORDERINGS ):
+        labels = [ 0 ] * ( n + 1 )
+        nextLabel = 1
+        cells = []
+        for row in rows:
+            gridRow = grid[row]
+            for col in cols:
+                value = gridRow[col]
+                if value != 0 and labels[value] == 0:
+                    labels[value] = nextLabel
+                    nextLabel += 1
+                cells.append( labels[value] )
+        if best is None or cells < best[0]:
+            best = ( cells, rows, cols, labels )
+
+    cells, rows, cols, labels = best
+
+    # values missing from the board take the labels left, in value order
+    nextLabel = max( labels ) + 1
+    for value in range( 1, n + 1 ):
+        if labels[value] == 0:
+            labels[value] = nextLabel
+            nextLabel += 1
+    return cells, Transform( p, q, transposed, list( rows ), list( cols ), labels )
+
+
+def refineColors ( grid, p, q ):
+    """
+        Colors the lines, values and blocks of lines by iterated refinement on the givens until no class splits
+        Returns: the colors of the rows, columns, bands and stacks
+    """
+    n = p * q
+    givens = [ ( row, col, value ) for row in range( n ) for col in range( n ) for value in ( grid[row][col], )
+               if value != 0 ]
+
+    rowColors = [ 0 ] * n
+    colColors = [ 0 ] * n
+    valueColors = [ 0 ] * ( n + 1 )
+    bandColors = [ 0 ] * q  # q bands of p rows
+    stackColors = [ 0 ] * p  # p stacks of q columns
+    classes = 0
+
+    while True:
+        rowKeys = [ [ bandColors[row // p], rowColors[row] ] for row in range( n ) ]
+        colKeys = [ [ stackColors[col // q], colColors[col] ] for col in range( n ) ]
+        valueKeys = [ [ valueColors[value] ] for value in range( n + 1 ) ]
+        for row, col, value in givens:
+            rowKeys[row].append( ( colColors[col], valueColors[value] ) )
+            colKeys[col].append( ( rowColors[row], valueColors[value] ) )
+            valueKeys[value].append( ( rowColors[row], colColors[col] ) )
+        bandKeys = [ ( bandColors[band], tuple( sorted( rowColors[band * p:( band + 1 ) * p] ) ) ) for band in range( q ) ]
+        stackKeys = [ ( stackColors[stack], tuple( sorted( colColors[stack * q:( stack + 1 ) * q] ) ) ) for stack in range( p ) ]
+
+        rowColors = rankKeys( [ ( key[0], key[1], tuple( sorted( key[2:] ) ) ) for key in rowKeys ] )
+        colColors = rankKeys( [ ( key[0], key[1], tuple( sorted( key[2:] ) ) ) for key in colKeys ] )
+        valueColors = rankKeys( [ ( key[0], tuple( sorted( key[1:] ) ) ) for key in valueKeys ] )
+        bandColors = rankKeys( bandKeys )
+        stackColors = rankKeys( stackKeys )
+
+        total = sum( len( set( colors ) ) for colors in ( rowColors, colColors, valueColors, bandColors, stackColors ) )
+        if total == classes:
+            return rowColors, colColors, bandColors, stackColors
+        classes = total
+
+
+# Returns the rank of each key among the distinct keys, so equal keys get equal colors
+def rankKeys ( keys ):
+    ranks = { key: rank for rank, key in enumerate( sorted( set( keys ) ) ) }
+    return [ ranks[key] for key in keys ]
+
+
+def lineOrders ( groups, size, groupColors, lineColors ):
+    """
+        Yields the orders of the groups * size lines, grouped size at a time, that sort the groups and the lines
+        of each group by color, every order of equal colors included. Only the first MAX_ORDERINGS orders of
+        each group are used, and every order is built as it is yielded, so taking a few of them stays cheap
+        however many lines tie
+    """
+    for groupOrder in tieOrders( range( groups ), groupColors ):
+        choices = [ lambda group = group: itertools.islice(
+                        tieOrders( range( group * size, ( group + 1 ) * size ), lineColors ), MAX_ORDERINGS )
+                    for group in groupOrder ]
+        for lines in lazyProduct( choices ):
+            yield tuple( line for group in lines for line in group )
+
+
+# Yields the orders of items sorted by color, with the items of equal colors in every order
+def tieOrders ( items, colors ):
+    items = sorted( items, key = lambda i: ( colors[i], i ) )
+    runs = [ list( run ) for _, run in itertools.groupby( items, key = lambda i: colors[i] ) ]
+    for orders in lazyProduct( [ lambda run = run: itertools.permutations( run ) for run in runs ] ):
+        yield [ i for order in orders for i in order ]
+
+
+def lazyProduct ( factories ):
+    """
+        Yields the tuples of itertools.product, in the same order, over the iterables returned by factories
+        Unlike product, which reads its inputs whole, each iterable is called for again instead of being stored,
+        so the first tuples come at once even when the inputs are huge
+    """
+    if not factories:
+        yield ()
+        return
+    for first in factories[0]():
+        for rest in lazyProduct( factories[1:] ):
+            yield ( first, ) + rest
@@ -7,12 +7,30 @@ from Sudoku_Board import Variable
 
 class Constraint:
 
+    __slots__ = ( "vars", "index", "candidateCounts", "assignedCounts", "candidateValues", "singleValues", "assignedValues",
+                  "conflicts" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
     def __init__ ( self ):
         self.vars = []
+        self.index = -1  # position in the network's constraint list, set by ConstraintNetwork.addConstraint
+
+        # Kept up to date by the ConstraintNetwork holding the constraint, see
+        # resetCounts. Indexed by value, the number of variables with the
+        # value in their domain and the number of variables assigned it
+        self.candidateCounts = []
+        self.assignedCounts = []
+
+        # Bits of the values in at least one domain, in exactly one domain and
+        # assigned to at least one variable, and the number of values assigned
+        # to more than one variable
+        self.candidateValues = 0
+        self.singleValues = 0
+        self.assignedValues = 0
+        self.conflicts = 0
 
     # ==================================================================
     # Modifiers
@@ -21,6 +39,77 @@ class Constraint:
     def addVariable ( self, v ):
         self.vars.append( v )
 
+    # Recounts the candidates and assignments of the variables, for values up to maxValue
+    def resetCounts ( self, maxValue ):
+        self.candidateCounts = [ 0 ] * ( maxValue + 1 )
+        self.assignedCounts = [ 0 ] * ( maxValue + 1 )
+        self.candidateValues = 0
+        self.singleValues = 0
+        self.assignedValues = 0
+        self.conflicts = 0
+
+        for v in self.vars:
+            bits = v.domain.bits
+            self.addCandidates( bits )
+            if v.isAssigned() and bits & ( bits - 1 ) == 0:
+                self.addAssignment( bits )
+
+    # Counts one more variable holding each value of bits
+    def addCandidates ( self, bits ):
+        counts = self.candidateCounts
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            value = bit.bit_length() - 1
+            count = counts[value] + 1
+            counts[value] = count
+            if count == 1:
+                self.candidateValues |= bit
+                self.singleValues |= bit
+            elif count == 2:
+                self.singleValues &= ~bit
+
+    # Counts one less variable holding each value of bits
+    def removeCandidates ( self, bits ):
+        counts = self.candidateCounts
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            value = bit.bit_length() - 1
+            count = counts[value] - 1
+            counts[value] = count
+            if count == 1:
+                self.singleValues |= bit
+            elif count == 0:
+                self.candidateValues &= ~bit
+                self.singleValues &= ~bit
+
+    # Counts one more variable assigned the value of bit
+    # Returns: 1 if the value is now assigned twice, 0 otherwise
+    def addAssignment ( self, bit ):
+        value = bit.bit_length() - 1
+        count = self.assignedCounts[value] + 1
+        self.assignedCounts[value] = count
+        if count == 1:
+            self.assignedValues |= bit
+        elif count == 2:
+            self.conflicts += 1
+            return 1
+        return 0
+
+    # Counts one less variable assigned the value of bit
+    # Returns: 1 if the value is no longer assigned twice, 0 otherwise
+    def removeAssignment ( self, bit ):
+        value = bit.bit_length() - 1
+        count = self.assignedCounts[value] - 1
+        self.assignedCounts[value] = count
+        if count == 0:
+            self.assignedValues &= ~bit
+        elif count == 1:
+            self.conflicts -= 1
+            return 1
+        return 0
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -42,16 +131,16 @@ class Constraint:
 
     # Returns true if constraint is consistent, false otherwise
     def isConsistent ( self ):
+        assignedBits = 0
         for var in self.vars:
             if not var.isAssigned():
                 continue
 
-            for otherVar in self.vars:
-                if var == otherVar:
-                    continue
-
-                if otherVar.isAssigned() and otherVar.getAssignment() == var.getAssignment():
-                    return False
+            # an assigned variable's domain holds only its assignment's bit
+            valueBit = var.domain.bits
+            if assignedBits & valueBit:
+                return False
+            assignedBits |= valueBit
 
         return True
 
@@ -1,7 +1,19 @@
 from Sudoku_Board import Variable
 from Sudoku_Board import Constraint
 from Sudoku_Board import SudokuBoard
-from math import floor
+from Sudoku_Board import MRVQueue
+from Sudoku_Board import NetworkTemplate
+from Sudoku_Board import Domain
+from array import array
+
+
+# Returns the bit of v's assigned value, 0 if v is unassigned
+def assignmentBit ( v ):
+    bits = v.domain.bits
+    if v.assigned and bits & ( bits - 1 ) == 0:
+        return bits
+    return 0
+
 
 """
     CSP representation of the problem. Contains the variables, constraints, and
@@ -9,6 +21,11 @@ from math import floor
 """
 class ConstraintNetwork:
 
+    __slots__ = ( "constraints", "variables", "neighbors", "peerBits", "variableConstraints", "mrvQueue",
+                  "modifiedConstraints", "domainBits", "assignmentBits", "conflicts", "valueFrequencies", "peerIndices",
+                  "unassignedDegrees", "cellRows", "cellCols", "cellBlocks", "unitOffsets", "unitCells", "candidateTotal",
+                  "assignedTotal" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
@@ -17,78 +34,188 @@ class ConstraintNetwork:
         self.constraints = []
         self.variables = []
 
+        # Per variable, by Variable.index, its peers (None until first asked
+        # for), their indices, a bitset of their indices and its containing
+        # constraints, kept up to date by addConstraint so lookups never scan
+        # the constraint list
+        self.neighbors = []
+        self.peerIndices = []
+        self.peerBits = []
+        self.variableConstraints = []
+
+        # Unassigned variables bucketed by domain size
+        self.mrvQueue = MRVQueue.MRVQueue()
+
+        # Constraints containing a variable modified since the last call to
+        # getModifiedConstraints, in the order they were first modified
+        self.modifiedConstraints = dict()
+
+        # Domain bits and assigned value bit (0 when unassigned) of each
+        # variable as counted by its constraints, by variable index, and the
+        # number of values assigned twice in a constraint over all constraints
+        self.domainBits = array( "Q" )
+        self.assignmentBits = array( "Q" )
+        self.conflicts = 0
+
+        # Number of variables assigned each value over the whole network, and
+        # number of unassigned neighbors of each variable by variable index,
+        # updated from the counted assignments
+        self.valueFrequencies = array( "i", [ 0 ] )
+        self.unassignedDegrees = array( "i" )
+
+        # Number of values left in all domains and of assigned variables,
+        # updated from the counted changes so reading them costs nothing
+        self.candidateTotal = 0
+        self.assignedTotal = 0
+
+        # Row, column and block of each variable by variable index, and the
+        # variable indices of each constraint in order of the constraint list,
+        # those of constraint k being unitCells[unitOffsets[k]:unitOffsets[k+1]]
+        self.cellRows = array( "i" )
+        self.cellCols = array( "i" )
+        self.cellBlocks = array( "i" )
+        self.unitOffsets = array( "i", [ 0 ] )
+        self.unitCells = array( "i" )
+
         if sboard != None:
-            board = sboard.board
-            temp = []
-            value = 0
-
-            for i in range(sboard.N):
-                for j in range(sboard.N):
-                    value = board[i][j]
-                    domain = []
-                    if value == 0:
-                        d = 1
-                        while d <= sboard.N:
-                            domain.append(d)
-                            d += 1
-                    else:
-                        domain.append(value)
-
-                    block = int(((floor(i/sboard.p) * sboard.p) + floor(j/sboard.q)))
-                    temp.append(Variable.Variable(domain, i, j, block))
-
-            rows = dict()
-            cols = dict()
-            blocks = dict()
-
-            for v in temp:
-                row = v.row
-                col = v.col
-                block = v.block
-
-                if not (row in rows.keys()):
-                    rows[row] = []
-                if not (col in cols.keys()):
-                    cols[col] = []
-                if not (block in blocks.keys()):
-                    blocks[block] = []
-
-                rows[row].append(v)
-                cols[col].append(v)
-                blocks[block].append(v)
-
-            for v in temp:
-                self.addVariable(v)
-
-            for e in rows:
-                c = Constraint.Constraint()
-                for v in rows[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
-
-            for e in cols:
-                c = Constraint.Constraint()
-                for v in cols[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
-
-            for e in blocks:
-                c = Constraint.Constraint()
-                for v in blocks[e]:
-                    c.addVariable(v)
-                self.addConstraint(c)
+            self.copyBoard( NetworkTemplate.getTemplate( sboard.p, sboard.q ), sboard.board )
+
+    # Creates the variables and constraints of board on the structure of its shape's template
+    def copyBoard ( self, template, board ):
+        n = template.N
+        fullBits = template.fullBits
+        fullDomain = Domain.Domain( range( 1, n + 1 ) )
+        names = template.names
+
+        variables = self.variables
+        for i in range( template.size ):
+            row = template.cellRows[i]
+            col = template.cellCols[i]
+            value = board[row][col]
+            domain = fullDomain.clone() if value == 0 else Domain.Domain( value )
+            v = Variable.Variable( domain, row, col, template.cellBlocks[i], names[i] )
+            v.network = self
+            v.index = i
+            variables.append( v )
+
+        # counted as an empty board, the givens are applied below
+        if n >= 64:
+            # bitsets past 64 values do not fit the array's items
+            self.domainBits = [ fullBits ] * template.size
+            self.assignmentBits = [ 0 ] * template.size
+        else:
+            self.domainBits = array( "Q", [ fullBits ] ) * template.size
+            self.assignmentBits = array( "Q", bytes( 8 * template.size ) )
+        self.cellRows = array( "i", template.cellRows )
+        self.cellCols = array( "i", template.cellCols )
+        self.cellBlocks = array( "i", template.cellBlocks )
+        self.unitOffsets = array( "i", template.unitOffsets )
+        self.unitCells = array( "i", template.unitCells )
+
+        # peer lists of variables are only built when first asked for
+        self.neighbors = [ None ] * template.size
+        self.peerIndices = list( template.peerIndices )
+        self.peerBits = list( template.peerBits )
+        self.unassignedDegrees = array( "i", ( len( peers ) for peers in template.peerIndices ) )
+        self.valueFrequencies = array( "i", bytes( 4 * ( n + 1 ) ) )
+        self.candidateTotal = n * template.size
+        self.assignedTotal = 0
+
+        # every unit starts with all of its cells holding every value
+        for k, unit in enumerate( template.units ):
+            c = Constraint.Constraint()
+            c.vars = [ variables[x] for x in unit ]
+            c.index = k
+            c.candidateCounts = [ 0 ] + [ len( unit ) ] * n
+            c.assignedCounts = [ 0 ] * ( n + 1 )
+            c.candidateValues = fullBits
+            c.singleValues = fullBits if len( unit ) == 1 else 0
+            self.constraints.append( c )
+        constraints = self.constraints
+        self.variableConstraints = [ [ constraints[k] for k in units ] for units in template.cellUnits ]
+
+        # then count the givens as changes to that empty board
+        for v in variables:
+            if v.assigned:
+                self.variableChanged( v )
+            else:
+                self.mrvQueue.update( v )
+
+        # constraints holding a given are modified, in constraint order
+        self.modifiedConstraints = dict.fromkeys( c for c in constraints if c.assignedValues )
 
     # ==================================================================
     # Modifiers
     # ==================================================================
 
     def addConstraint ( self, c ):
-        if c not in self.constraints:
+        if not 0 <= c.index < len( self.constraints ) or self.constraints[c.index] is not c:
+            c.index = len( self.constraints )
             self.constraints.append( c )
+            self.indexConstraint( c )
 
     def addVariable ( self, v ):
-        if v not in self.variables:
+        if v.network is not self:
+            v.network = self
+            v.index = len( self.variables )
+            if v.name is None:
+                v.name = "v" + str( v.index + 1 )
             self.variables.append( v )
+            self.neighbors.append( None )
+            self.peerIndices.append( () )
+            self.peerBits.append( 0 )
+            self.variableConstraints.append( [] )
+
+            bits = v.domain.bits
+            maxValue = bits.bit_length() - 1
+            if maxValue >= 64 and type( self.domainBits ) is not list:
+                # bitsets past 64 values do not fit the array's items
+                self.domainBits = list( self.domainBits )
+                self.assignmentBits = list( self.assignmentBits )
+            self.domainBits.append( bits )
+            self.candidateTotal += Domain.popcount( bits )
+            assignment = assignmentBit( v )
+            self.assignmentBits.append( assignment )
+            if assignment:
+                self.assignedTotal += 1
+
+            self.unassignedDegrees.append( 0 )
+            if maxValue >= len( self.valueFrequencies ):
+                self.valueFrequencies.extend( [ 0 ] * ( maxValue + 1 - len( self.valueFrequencies ) ) )
+            if assignment:
+                self.valueFrequencies[ maxValue ] += 1
+
+            self.cellRows.append( v.row )
+            self.cellCols.append( v.col )
+            self.cellBlocks.append( v.block )
+            self.mrvQueue.update( v )
+
+    # Records c in the constraint and peer index of each of its variables and counts their values in c
+    def indexConstraint ( self, c ):
+        for v in c.vars:
+            self.addVariable( v )
+
+        c.resetCounts( max( ( v.domain.bits.bit_length() - 1 for v in c.vars ), default = 0 ) )
+        self.conflicts += c.conflicts
+        self.unitCells.extend( v.index for v in c.vars )
+        self.unitOffsets.append( len( self.unitCells ) )
+
+        for v in c.vars:
+            i = v.index
+            self.variableConstraints[i].append( c )
+            if v.isModified():
+                self.modifiedConstraints[c] = None
+            peers = list( self.peerIndices[i] )
+            peerBits = self.peerBits[i]
+            for x in c.vars:
+                if x is not v and not peerBits >> x.index & 1:
+                    peerBits |= 1 << x.index
+                    peers.append( x.index )
+                    if not self.assignmentBits[x.index]:
+                        self.unassignedDegrees[i] += 1
+            self.peerIndices[i] = tuple( peers )
+            self.peerBits[i] = peerBits
+            self.neighbors[i] = None
 
     # ==================================================================
     # Accessors
@@ -100,56 +227,129 @@ class ConstraintNetwork:
     def getVariables ( self ):
         return self.variables
 
-    # Returns all variables that share a constraint with v
-    def getNeighborsOfVariable ( self, v ):
-        neighbors = set()
+    # Called by v whenever its domain or assignment changes
+    def variableChanged ( self, v ):
+        self.mrvQueue.update( v )
+        i = v.index
+        constraints = self.variableConstraints[i]
+        if v.modified:
+            for c in constraints:
+                self.modifiedConstraints[c] = None
+
+        # Update the counts of v's constraints with the difference from the state they counted
+        oldBits = self.domainBits[i]
+        newBits = v.domain.bits
+        oldAssignment = self.assignmentBits[i]
+        newAssignment = assignmentBit( v )
+        if oldBits != newBits:
+            self.domainBits[i] = newBits
+            removed = oldBits & ~newBits
+            added = newBits & ~oldBits
+            self.candidateTotal += Domain.popcount( added ) - Domain.popcount( removed )
+            for c in constraints:
+                if removed:
+                    c.removeCandidates( removed )
+                if added:
+                    c.addCandidates( added )
+        if oldAssignment != newAssignment:
+            self.assignmentBits[i] = newAssignment
+            for c in constraints:
+                if oldAssignment:
+                    self.conflicts -= c.removeAssignment( oldAssignment )
+                if newAssignment:
+                    self.conflicts += c.addAssignment( newAssignment )
+
+            if oldAssignment:
+                self.valueFrequencies[oldAssignment.bit_length() - 1] -= 1
+                self.assignedTotal -= 1
+            if newAssignment:
+                self.valueFrequencies[newAssignment.bit_length() - 1] += 1
+                self.assignedTotal += 1
+
+            # v's neighbors gain or lose an unassigned neighbor when v is unassigned or assigned
+            if not oldAssignment or not newAssignment:
+                change = 1 if newAssignment == 0 else -1
+                degrees = self.unassignedDegrees
+                for x in self.peerIndices[i]:
+                    degrees[x] += change
+
+    # Returns the first unassigned variable with the smallest domain, or None
+    def getMRVVariable ( self ):
+        return self.mrvQueue.getMinimum()
+
+    # Returns all unassigned variables tied on the smallest domain, in network order
+    def getMRVTies ( self ):
+        return self.mrvQueue.getMinimumTies()
+
+    # Returns a copy of the domain bits and assigned value bits (0 when unassigned) of every variable,
+    # by variable index
+    def captureState ( self ):
+        return self.domainBits[:], self.assignmentBits[:]
+
+    # Restores every changeable variable to a state returned by captureState
+    def restoreState ( self, state ):
+        bits, assignments = state
+        for v in self.variables:
+            if v.changeable:
+                v.restore( bits[v.index], assignments[v.index] != 0 )
 
-        for c in self.constraints:
-            if c.contains( v ):
-                for x in c.vars:
-                    neighbors.add( x )
+    # Returns the number of variables assigned each value, indexed by value
+    # The returned list is the network's table, callers must not modify it
+    def getValueFrequencies ( self ):
+        return self.valueFrequencies
 
-        neighbors.remove( v )
-        return list( neighbors )
+    # Returns the number of assigned variables
+    def getAssignedTotal ( self ):
+        return self.assignedTotal
 
-    # Returns true is every constraint is consistent
-    def isConsistent ( self ):
-        for c in self.constraints:
-            if not c.isConsistent():
-                return False
+    # Returns the number of values left in the domains of all variables
+    def getCandidateTotal ( self ):
+        return self.candidateTotal
 
-        return True
+    # Returns the number of unassigned variables sharing a constraint with v
+    def getUnassignedDegree ( self, v ):
+        return self.unassignedDegrees[v.index]
+
+    # Returns all variables that share a constraint with v
+    # The returned list is the network's index, callers must not modify it
+    def getNeighborsOfVariable ( self, v ):
+        peers = self.neighbors[v.index]
+        if peers is None:
+            variables = self.variables
+            peers = [ variables[x] for x in self.peerIndices[v.index] ]
+            self.neighbors[v.index] = peers
+        return peers
+
+    # Returns true is every constraint is consistent, read from the counts of assigned values
+    def isConsistent ( self ):
+        return self.conflicts == 0
 
     # Returns a list of constraints that contains v
     def getConstraintsContainingVariable ( self, v ):
         """
             @param v variable to check
-            @return list of constraints that contains v
+            @return list of constraints that contains v, owned by the network
         """
-        outList = []
-        for c in self.constraints:
-            if c.contains( v ):
-                outList.append( c )
-        return outList
+        return self.variableConstraints[v.index]
 
     """
         Returns the constraints that contain variables whose domains were
         modified since the last call to this method.
 
-        After getting the constraints, it will reset each variable to
-        unmodified
+        After getting the constraints, it will reset each of their variables
+        to unmodified. Variables restored by the trail are unmodified, so
+        backtracking alone never marks a constraint.
 
         Note* The first call to this method returns the constraints containing
         the initialized variables.
     """
     def getModifiedConstraints ( self ):
-        mConstraints = []
-        for c in self.constraints:
-            if c.isModified():
-                mConstraints.append( c )
+        mConstraints = list( self.modifiedConstraints )
+        self.modifiedConstraints = dict()
 
-        for v in self.variables:
-            v.setModified( False )
+        for c in mConstraints:
+            for v in c.vars:
+                v.setModified( False )
 
         return mConstraints
 
@@ -184,12 +384,8 @@ class ConstraintNetwork:
     def toSudokuBoard ( self, p, q ):
         n = p*q
         board = [[ 0 for j in range( n )] for i in range( n )]
-        row = 0
-        col = 0
-        for v in self.variables:
-            board[row][col] = v.getAssignment()
-            col += 1
-            if col == n:
-                col = 0
-                row += 1
-        return SudokuBoard.SudokuBoard(p, q, board = board)
\ No newline at end of file
+        for i in range( len( self.variables ) ):
+            assignment = self.assignmentBits[i]
+            if assignment:
+                board[self.cellRows[i]][self.cellCols[i]] = assignment.bit_length() - 1
+        return SudokuBoard.SudokuBoard(p, q, board = board)
@@ -1,42 +1,87 @@
 """
     Represents the domain of a variable, i.e. the possible values that each
     variable may assign.
+
+    The values are stored as an integer bitset, bit v is set when value v is
+    in the domain, so they are always listed in ascending order whatever order
+    they were given or added in.
 """
 
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount ( bits ):
+        return bin( bits ).count( "1" )
+
+
+# Returns the values whose bits are set in bits, in ascending order
+def bitsToValues ( bits ):
+    values = []
+    while bits:
+        low = bits & -bits
+        values.append( low.bit_length() - 1 )
+        bits ^= low
+    return values
+
+
+# Returns the bitset holding every value in values
+def valuesToBits ( values ):
+    bits = 0
+    for v in values:
+        bits |= 1 << v
+    return bits
+
+
 class Domain:
 
+    __slots__ = ( "bits", "modified" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
     def __init__ ( self, value_or_values ):
-        self.values = []
         if type( value_or_values ) is int:
-            self.values.append( value_or_values )
+            self.bits = 1 << value_or_values
 
         else:
-            self.values = value_or_values
+            self.bits = valuesToBits( value_or_values )
 
         self.modified = False
 
     def copy ( self, values ):
-        self.values = values
+        self.bits = valuesToBits( values )
+
+    # Returns a new domain holding the same values
+    def clone ( self ):
+        d = Domain( () )
+        d.bits = self.bits
+        return d
 
     # ==================================================================
     # Accessors
     # ==================================================================
 
+    # The values of the domain in ascending order
+    @property
+    def values ( self ):
+        return bitsToValues( self.bits )
+
+    @values.setter
+    def values ( self, values ):
+        self.bits = valuesToBits( values )
+
     # Checks if value exists within the domain
     def contains ( self, v ):
-        return v in self.values
+        return self.bits >> v & 1 == 1
 
     # Returns number of values in the domain
     def size ( self ):
-        return len(self.values)
+        return popcount( self.bits )
 
     # Returns true if no values are contained in the domain
     def isEmpty ( self ):
-        return not self.values
+        return self.bits == 0
 
     # Returns whether or not the domain has been modified
     def isModified ( self ):
@@ -48,14 +93,14 @@ class Domain:
 
     # Adds a value to the domain
     def add ( self, num ):
-        if num not in self.values:
-            self.values.append( num )
+        self.bits |= 1 << num
 
     # Remove a value from the domain
     def remove ( self, num ):
-        if num in self.values:
+        bit = 1 << num
+        if self.bits & bit:
             self.modified = True
-            self.values.remove( num )
+            self.bits ^= bit
             return True
 
         else:
@@ -70,13 +115,4 @@ class Domain:
     # ==================================================================
 
     def __str__ ( self ):
-        output = "{"
-        for i in range(len(self.values) - 1):
-            output += str(self.values[i]) + ", "
-        try:
-            output += str(self.values[-1])
-        except:
-            pass
-
-        output += "}"
-        return output
+        return "{" + ", ".join( str( v ) for v in self.values ) + "}"
@@ -0,0 +1,73 @@
+"""
+    Bucket queue of the unassigned variables of a network, keyed by domain size.
+    Variables report their changes through ConstraintNetwork.variableChanged,
+    so the smallest domain and the variables tied on it are found without
+    scanning the whole network.
+
+    Ties are returned in network order (by Variable.index) so selectors pick
+    the same variable a full scan over the network's variables would.
+"""
+
+class MRVQueue:
+
+    __slots__ = ( "buckets", )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self ):
+        self.buckets = []
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Moves v to the bucket of its current domain size, or drops it once assigned
+    def update ( self, v ):
+        key = -1 if v.assigned else v.domain.size()
+        old = v.mrvBucket
+        if key == old:
+            return
+
+        if old != -1:
+            self.buckets[old].discard( v )
+
+        if key != -1:
+            while len( self.buckets ) <= key:
+                self.buckets.append( set() )
+            self.buckets[key].add( v )
+
+        v.mrvBucket = key
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Returns the smallest non empty bucket, or None if every variable is assigned
+    def minimumBucket ( self ):
+        for bucket in self.buckets:
+            if bucket:
+                return bucket
+        return None
+
+    # Returns the first unassigned variable with the smallest domain, or None
+    def getMinimum ( self ):
+        bucket = self.minimumBucket()
+        if bucket is None:
+            return None
+        return min( bucket, key = indexOf )
+
+    # Returns every unassigned variable with the smallest domain, in network order
+    def getMinimumTies ( self ):
+        bucket = self.minimumBucket()
+        if bucket is None:
+            return []
+        return sorted( bucket, key = indexOf )
+
+    def size ( self ):
+        return sum( len( bucket ) for bucket in self.buckets )
+
+
+def indexOf ( v ):
+    return v.index
@@ -0,0 +1,85 @@
+import threading
+from array import array
+
+"""
+    The board independent structure of the constraint network of a p x q
+    sudoku: the row, column and block of each cell, the cells of each unit and
+    the peers of each cell, all as cell indices (row * N + col).
+
+    A template is built once per shape by getTemplate and shared, read only,
+    by every ConstraintNetwork of that shape, which only has to create its
+    variables and copy the board's givens onto them. Networks built in
+    several threads at once share the same templates.
+"""
+
+# (p, q) -> NetworkTemplate
+TEMPLATES = dict()
+# held while a template is built, so each shape is built once
+TEMPLATES_LOCK = threading.Lock()
+
+
+# Returns the cached template of the p x q shape, building it on first use
+def getTemplate ( p, q ):
+    template = TEMPLATES.get( ( p, q ) )
+    if template is None:
+        with TEMPLATES_LOCK:
+            template = TEMPLATES.get( ( p, q ) )
+            if template is None:
+                template = NetworkTemplate( p, q )
+                TEMPLATES[( p, q )] = template
+    return template
+
+
+class NetworkTemplate:
+
+    __slots__ = ( "p", "q", "N", "size", "fullBits", "names", "cellRows", "cellCols", "cellBlocks", "units",
+                  "cellUnits", "peerIndices", "peerBits", "unitOffsets", "unitCells" )
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, p, q ):
+        self.p = p
+        self.q = q
+        self.N = n = p * q
+        self.size = n * n
+        self.fullBits = ( 1 << ( n + 1 ) ) - 2
+
+        cells = range( self.size )
+        self.names = [ "v" + str( i + 1 ) for i in cells ]
+        self.cellRows = array( "i", ( i // n for i in cells ) )
+        self.cellCols = array( "i", ( i % n for i in cells ) )
+        self.cellBlocks = array( "i", ( ( i // n // p ) * p + i % n // q for i in cells ) )
+
+        # rows, then columns, then blocks, each listing its cells in board order
+        self.units = [ tuple( row * n + col for col in range( n ) ) for row in range( n ) ]
+        self.units += [ tuple( row * n + col for row in range( n ) ) for col in range( n ) ]
+        blocks = [ [] for _ in range( n ) ]
+        for i in cells:
+            blocks[self.cellBlocks[i]].append( i )
+        self.units += [ tuple( block ) for block in blocks ]
+
+        self.unitOffsets = array( "i", [ 0 ] )
+        self.unitCells = array( "i" )
+        cellUnits = [ [] for _ in cells ]
+        for k, unit in enumerate( self.units ):
+            self.unitCells.extend( unit )
+            self.unitOffsets.append( len( self.unitCells ) )
+            for i in unit:
+                cellUnits[i].append( k )
+        self.cellUnits = [ tuple( units ) for units in cellUnits ]
+
+        # peers in order of first appearance in the cell's row, column and block
+        self.peerIndices = []
+        self.peerBits = []
+        for i in cells:
+            peers = []
+            peerBits = 1 << i
+            for k in self.cellUnits[i]:
+                for x in self.units[k]:
+                    if not peerBits >> x & 1:
+                        peerBits |= 1 << x
+                        peers.append( x )
+            self.peerIndices.append( tuple( peers ) )
+            self.peerBits.append( peerBits ^ ( 1 << i ) )
@@ -7,6 +7,8 @@ import random
 
 class SudokuBoard:
 
+    __slots__ = ( "p", "q", "N", "board" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
@@ -1,25 +1,40 @@
-from Sudoku_Board import Domain
-
 """
     Represents the trail of changes made. This allows backtracking to occur.
+
+    In DELTA mode (the default) each entry only records a variable's previous
+    domain bits and assignment flag, and a push of the variable that is
+    already on top of the trail since the last marker adds no entry, as that
+    entry restores an earlier state of it. SNAPSHOT mode keeps a full Domain
+    copy per push.
+    Both modes count pushes and undos the same way.
 """
 
 class Trail:
 
+    __slots__ = ( "mode", "trailStack", "trailMarker", "numPush", "numUndo" )
+
     # ==================================================================
     # Properties
     # ==================================================================
-    numPush = 0
-    numUndo = 0
+    SNAPSHOT = "snapshot"
+    DELTA = "delta"
 
     # ==================================================================
     # Constructor
     # ==================================================================
 
-    def __init__ ( self ):
+    def __init__ ( self, mode = DELTA ):
+        if mode != Trail.SNAPSHOT and mode != Trail.DELTA:
+            raise ValueError( "Unknown trail mode: " + str( mode ) )
+
+        self.mode = mode
         self.trailStack  = []
         self.trailMarker = []
 
+        # counted per trail so separate solves never share statistics
+        self.numPush = 0
+        self.numUndo = 0
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -28,10 +43,10 @@ class Trail:
         return len( self.trailStack )
 
     def getPushCount ( self ):
-        return Trail.numPush
+        return self.numPush
 
     def getUndoCount ( self ):
-        return Trail.numUndo
+        return self.numUndo
 
     # ==================================================================
     # Modifiers
@@ -48,16 +63,34 @@ class Trail:
         you can restore propagated domains correctly.
     """
     def push ( self, v ):
-        Trail.numPush += 1
-        domainCopy = Domain.Domain([i for i in v.getValues()])
-        vPair = [v, domainCopy]
-        self.trailStack.append(vPair)
+        self.numPush += 1
+
+        if self.mode == Trail.SNAPSHOT:
+            domainCopy = v.getDomain().clone()
+            vPair = [v, domainCopy]
+            self.trailStack.append(vPair)
+            return
+
+        # An entry for v above the last marker already restores an earlier state of v
+        stack = self.trailStack
+        if stack and stack[-1][0] is v and len( stack ) > ( self.trailMarker[-1] if self.trailMarker else 0 ):
+            return
+
+        stack.append( ( v, v.domain.bits, v.assigned ) )
 
     # Pops and restores variables on the trail until the last trail marker
     def undo ( self ):
-        Trail.numUndo += 1
+        self.numUndo += 1
         targetSize = self.trailMarker.pop() # targetSize target position on the trail to backtrack to
         size = len(self.trailStack)
+
+        if self.mode == Trail.DELTA:
+            while size > targetSize:
+                v, bits, assigned = self.trailStack.pop()
+                v.restore( bits, assigned )
+                size -= 1
+            return
+
         while size > targetSize:
             vPair = self.trailStack.pop()
             v = vPair[0]
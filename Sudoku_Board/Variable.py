@@ -2,25 +2,38 @@ from Sudoku_Board import Domain
 
 """
     Represents a variable in a CSP
-"""
 
-STATIC_NAMING_COUNTER = 1
+    A variable created without a name is named after its index once a
+    ConstraintNetwork adds it, so names never depend on how many variables
+    other solves created before it.
+"""
 
 class Variable:
 
+    __slots__ = ( "name", "domain", "row", "col", "block", "network", "index", "mrvBucket", "assigned", "modified",
+                  "changeable" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
-    def __init__ ( self, possible_Values, row, col, block ):
-        global STATIC_NAMING_COUNTER
-        self.name = "v" + str(STATIC_NAMING_COUNTER)
-        STATIC_NAMING_COUNTER += 1
+    def __init__ ( self, possible_Values, row, col, block, name = None ):
+        self.name = name
 
-        self.domain = Domain.Domain(possible_Values)
+        # a Domain is taken as is, anything else is the list of values
+        if isinstance( possible_Values, Domain.Domain ):
+            self.domain = possible_Values
+        else:
+            self.domain = Domain.Domain(possible_Values)
         self.row = row
         self.col = col
         self.block = block
+
+        # Set by the ConstraintNetwork that owns the variable, which is told
+        # about every change to the domain or assignment
+        self.network = None
+        self.index = -1
+        self.mrvBucket = -1
         if self.size() == 1:
             self.assigned = True
             self.modified = True
@@ -59,7 +72,7 @@ class Variable:
         if not self.isAssigned():
             return 0
         else:
-            return self.domain.values[0]
+            return self.domain.bits.bit_length() - 1
 
     def getDomain ( self ):
         return self.domain
@@ -80,6 +93,8 @@ class Variable:
 
     def unassign(self):
         self.assigned = False
+        if self.network is not None:
+            self.network.variableChanged( self )
 
     # Assign a value to the variable
     def assignValue ( self, val ):
@@ -87,7 +102,10 @@ class Variable:
             return
 
         self.assigned = True
-        self.setDomain(Domain.Domain(val))
+        self.domain.bits = 1 << val
+        self.modified = True
+        if self.network is not None:
+            self.network.variableChanged( self )
 
     # Sets the domain of the variable
     def setDomain ( self, d ):
@@ -97,14 +115,26 @@ class Variable:
         if self.domain != d:
             self.domain = d
             self.modified = True
+            if self.network is not None:
+                self.network.variableChanged( self )
+
+    # Restores the domain bits and assignment flag recorded by the trail
+    def restore ( self, bits, assigned ):
+        self.domain.bits = bits
+        self.assigned = assigned
+        self.setModified( False )
+        if self.network is not None:
+            self.network.variableChanged( self )
 
     # Removes a value from the domain
     def removeValueFromDomain ( self, val ):
         if not self.changeable:
             return
 
-        self.domain.remove( val )
+        removed = self.domain.remove( val )
         self.modified = self.domain.isModified()
+        if removed and self.network is not None:
+            self.network.variableChanged( self )
 
     # ==================================================================
     # String representation
@@ -113,7 +143,7 @@ class Variable:
     def __str__ ( self ):
         # "print node stats"
         output = ""
-        output += " Name: " + self.name
+        output += " Name: " + str( self.name )
         output += " domain: {"
         for i in self.domain.values:
             output += str(i) + ","